@@ -10,28 +10,78 @@ Logic.py - 法律计算与逻辑核心模块
 3. calculate_liquidated_damages: 综合违约金计算
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
+import asyncio
 import logging
+import time
 
 # 引入自定义异常和日志配置
-from errors import InvalidParamsError, InternalError, DBSyncError
+from errors import ErrorCode, InvalidParamsError, InternalError
 from logger_config import setup_logger
 
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    # Numba 为可选依赖，未安装时 njit 退化为恒等装饰器，数值内核以纯 Python 运行
+    _HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 logger = setup_logger()
 
+if not _HAS_NUMBA:
+    # 仅在模块加载时提示一次，计算结果不受影响
+    logger.warning("未安装 numba，违约金数值内核将以纯 Python 运行")
+
+# LPR 每月 20 日发布一次，缓存 1 小时即可避免每次计算都访问外部数据源
+LPR_CACHE_TTL = 3600.0
+_lpr_cache: Optional[Tuple[float, float]] = None  # (lpr, 过期时间 monotonic)
+# 异步获取 LPR 的 single-flight 锁 (事件循环, 锁)，按当前事件循环惰性创建
+_lpr_lock: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = None
+
+
+def _fetch_lpr() -> float:
+    """
+    从数据源获取最新 1 年期 LPR
+    在实际应用中，这里应该调用外部 API。
+    目前为了演示，返回 2024年初的参考值 3.45% (0.0345)
+    """
+    return 0.0345
+
+
+def _cached_lpr() -> Optional[float]:
+    """返回未过期的缓存 LPR，无缓存或已过期时返回 None"""
+    if _lpr_cache is not None and time.monotonic() < _lpr_cache[1]:
+        return _lpr_cache[0]
+    return None
+
+
+def _store_lpr(lpr: float) -> float:
+    """写入 LPR 缓存"""
+    global _lpr_cache
+    _lpr_cache = (lpr, time.monotonic() + LPR_CACHE_TTL)
+    return lpr
+
 class RiskLevel(Enum):
     LOW = "Low"
     MEDIUM = "Medium"
     HIGH = "High"
     CRITICAL = "Critical"  # 触犯法律红线
 
-@dataclass
+# 预先取出枚举值，避免热路径上重复的 Enum 属性访问
+_RL: Dict[str, str] = {level.name: level.value for level in RiskLevel}
+
+@dataclass(slots=True, frozen=True)
 class DiscretionaryWeight:
     """
     司法裁量权权重类
     包含基于司法解释第 65 条的权重矩阵所需的强类型字段
+    使用 __slots__ 且不可变 (可哈希)，便于批量创建及作为缓存键
     """
     performance_ratio: float  # 0.0-1.0
     fault_score: float        # 1.0-2.0 (1.0: 轻微过失, 2.0: 恶意/重大过失)
@@ -47,9 +97,7 @@ class RedLineInterceptors:
     @staticmethod
     def get_latest_lpr(simulate_db_failure: bool = False) -> float:
         """
-        获取最新 1 年期 LPR
-        在实际应用中，这里应该调用外部 API。
-        目前为了演示，返回 2024年初的参考值 3.45% (0.0345)
+        获取最新 1 年期 LPR (带 TTL 缓存，过期后才重新访问数据源)
         
         Args:
             simulate_db_failure: 是否模拟数据库同步失败
@@ -66,7 +114,37 @@ class RedLineInterceptors:
             # 所以这里应该抛出 InternalError。
             raise InternalError("法律数据库同步失败，已切换至备用静态数据源")
 
-        return 0.0345
+        lpr = _cached_lpr()
+        if lpr is not None:
+            return lpr
+        return _store_lpr(_fetch_lpr())
+
+    @staticmethod
+    async def get_latest_lpr_async() -> float:
+        """
+        异步获取最新 1 年期 LPR (single-flight)
+        与 get_latest_lpr 共享 TTL 缓存；缓存失效时并发调用方只触发一次上游请求，
+        其余调用方等待锁释放后直接读取缓存。上游请求在线程中执行，不阻塞事件循环。
+        """
+        global _lpr_lock
+        lpr = _cached_lpr()
+        if lpr is not None:
+            return lpr
+
+        loop = asyncio.get_running_loop()
+        if _lpr_lock is None or _lpr_lock[0] is not loop:
+            _lpr_lock = (loop, asyncio.Lock())
+        async with _lpr_lock[1]:
+            lpr = _cached_lpr()
+            if lpr is not None:
+                return lpr
+            return _store_lpr(await asyncio.to_thread(_fetch_lpr))
+
+    @staticmethod
+    def clear_lpr_cache() -> None:
+        """清除 LPR 缓存 (如 LPR 调整后需要立即生效时调用)"""
+        global _lpr_cache
+        _lpr_cache = None
 
     @staticmethod
     def check_private_lending_interest(rate: float, simulate_db_failure: bool = False) -> Dict[str, Any]:
@@ -89,7 +167,7 @@ class RedLineInterceptors:
         if rate > limit:
             # 参数超出法律红线：返回 -32602 (Invalid params) 并在 data 字段中附带违法的法条依据
             error_details = {
-                "risk_level": RiskLevel.CRITICAL.value,
+                "risk_level": _RL["CRITICAL"],
                 "legal_basis": "《最高人民法院关于审理民间借贷案件适用法律若干问题的规定》",
                 "limit": limit,
                 "provided": rate
@@ -101,7 +179,7 @@ class RedLineInterceptors:
             
         return {
             "triggered": False,
-            "risk_level": RiskLevel.LOW.value,
+            "risk_level": _RL["LOW"],
             "message": "利率在法律保护范围内。",
             "capped_value": rate
         }
@@ -123,6 +201,127 @@ class RedLineInterceptors:
         limit = (training_cost / total_months) * remaining_months
         return limit
 
+@njit(cache=True, fastmath=True)
+def _calc_penalty(
+    actual_loss: float,
+    expectation_loss: float,
+    mitigation_benefit: float,
+    performance_ratio: float,
+    fault_score: float
+):
+    """
+    违约金数值内核 (仅含标量运算，便于 JIT 编译)
+
+    Returns:
+        (L, w1, gamma, penalty)
+    """
+    # 使用 max 代替 if 分支截断负值，JIT 后可编译为无分支的 maxsd 指令
+    L = max(actual_loss + expectation_loss - mitigation_benefit, 0.0)
+    w1 = max(1.0 - performance_ratio, 0.0)
+    gamma = 0.3 * w1 * fault_score
+    return L, w1, gamma, L * (1.0 + gamma)
+
+
+if _HAS_NUMBA:
+    # 模块加载时预热编译，避免首个请求承担 JIT 开销
+    _calc_penalty(0.0, 0.0, 0.0, 0.0, 1.0)
+
+
+@lru_cache(maxsize=4096)
+def _penalty_cached(
+    actual_loss: float,
+    expectation_loss: float,
+    mitigation_benefit: float,
+    performance_ratio: float,
+    fault_score: float
+):
+    """带记忆化的数值内核，参数扫描、what-if 测算等重复输入直接命中缓存"""
+    return _calc_penalty(actual_loss, expectation_loss, mitigation_benefit, performance_ratio, fault_score)
+
+
+def clear_calculation_cache() -> None:
+    """清除违约金计算缓存 (如计算规则调整后需要立即生效时调用)"""
+    _penalty_cached.cache_clear()
+
+
+def _calc_private_lending(
+    result: Dict[str, Any],
+    rate: float,
+    simulate_db_failure: bool
+) -> Dict[str, Any]:
+    """民间借贷场景: LPR 4倍封顶"""
+    # 这里 check_private_lending_interest 会在超限时抛出 InvalidParamsError
+    # 会在 DB 失败时抛出 InternalError
+    RedLineInterceptors.check_private_lending_interest(rate, simulate_db_failure=simulate_db_failure)
+
+    result['final_suggestion'] = rate
+    return result
+
+
+def _calc_labor_contract(
+    result: Dict[str, Any],
+    training_cost: float,
+    total_months: int,
+    remaining_months: int
+) -> Dict[str, Any]:
+    """劳动合同场景: 违约金上限为服务期尚未履行部分所应分摊的培训费用"""
+    # 可能抛出 InvalidParamsError
+    limit = RedLineInterceptors.check_labor_contract_limit(
+        training_cost, total_months, remaining_months
+    )
+
+    # 劳动合同违约金直接应用此上限
+    result['adjustments'].append({
+         "message": f"劳动合同违约金上限为服务期尚未履行部分所应分摊的培训费用 ({limit:.2f})。",
+         "legal_basis": "《中华人民共和国劳动合同法》第二十二条",
+    })
+    result['final_suggestion'] = limit
+    return result
+
+
+def _calc_general(
+    result: Dict[str, Any],
+    actual_loss: float,
+    expectation_loss: float,
+    mitigation_benefit: float,
+    discretionary_weight: Optional[DiscretionaryWeight]
+) -> Dict[str, Any]:
+    """通用/商业合同场景: Penalty = L * (1 + gamma)"""
+    # 基础公式计算 L = Actual_Loss + Expectation_Loss - Mitigation_Benefit
+    # 调整系数 gamma = 0.3 * w1 * w2 (无裁量权权重时 w1 = 0, gamma = 0)
+    if discretionary_weight:
+        performance_ratio = float(discretionary_weight.performance_ratio)
+        fault_score = float(discretionary_weight.fault_score)
+    else:
+        performance_ratio, fault_score = 1.0, 0.0
+
+    L, w1, gamma, penalty = _penalty_cached(
+        float(actual_loss), float(expectation_loss), float(mitigation_benefit),
+        performance_ratio, fault_score
+    )
+
+    result['base_loss_L'] = L
+
+    if discretionary_weight:
+        result['gamma_calculation'] = {
+            "w1 (1 - performance)": w1,
+            "w2 (fault_score)": fault_score,
+            "gamma": gamma
+        }
+        
+        # 消费者合同特殊标记
+        if discretionary_weight.is_consumer_contract:
+            result['adjustments'].append({
+                "type": "consumer_protection",
+                "message": "消费者合同，建议法院在裁量时更加倾向于保护消费者权益，严格审查格式条款。",
+                "legal_basis": "《消费者权益保护法》"
+            })
+
+    # 最终金额 Penalty = L * (1 + gamma)
+    result['final_suggestion'] = penalty
+    return result
+
+
 def calculate_liquidated_damages(
     actual_loss: float,
     expectation_loss: float = 0.0,
@@ -130,7 +329,11 @@ def calculate_liquidated_damages(
     discretionary_weight: Optional[DiscretionaryWeight] = None,
     scenario: str = 'general_contract',
     causal_trace_id: Optional[str] = None,
-    **kwargs
+    rate: float = 0.0,
+    training_cost: float = 0.0,
+    total_months: int = 12,
+    remaining_months: int = 0,
+    simulate_db_failure: bool = False
 ) -> Dict[str, Any]:
     """
     重写后的综合违约金计算函数
@@ -140,10 +343,15 @@ def calculate_liquidated_damages(
              w1 = 1 - performance_ratio
              w2 = fault_score (若 malicious 则 w2=2.0, 否则 1.0~2.0)
     最终金额：Penalty = L * (1 + gamma)
+
+    红线场景参数：
+        private_lending: rate, simulate_db_failure
+        labor_contract: training_cost, total_months, remaining_months
     """
     
-    # 记录因果追踪 ID
-    logger.info(f"Starting calculation for scenario: {scenario}", extra={"trace_id": causal_trace_id})
+    # 记录因果追踪 ID (日志级别关闭时跳过格式化及 extra 字典构造)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Starting calculation for scenario: %s", scenario, extra={"trace_id": causal_trace_id})
 
     result = {
         "scenario": scenario,
@@ -152,79 +360,78 @@ def calculate_liquidated_damages(
         "causal_trace_id": causal_trace_id
     }
 
-    simulate_db_failure = kwargs.get('simulate_db_failure', False)
-
-    # 1. 红线拦截器逻辑
+    # 红线场景单独处理，其余场景 (含未知场景) 均按通用合同计算；各计算函数只接收自己用到的参数
     if scenario == 'private_lending':
-        # 民间借贷场景，kwargs 中应包含利率 'rate' (例如 0.24)
-        rate = kwargs.get('rate', 0.0)
-        
-        # 这里 check_private_lending_interest 会在超限时抛出 InvalidParamsError
-        # 会在 DB 失败时抛出 InternalError
-        check = RedLineInterceptors.check_private_lending_interest(rate, simulate_db_failure=simulate_db_failure)
-        
-        result['final_suggestion'] = rate
-        return result
-            
-    elif scenario == 'labor_contract':
-        # 劳动合同场景，必须提供 training_cost, total_months, remaining_months
-        training_cost = kwargs.get('training_cost', 0.0)
-        total_months = kwargs.get('total_months', 12)
-        remaining_months = kwargs.get('remaining_months', 0)
-        
-        # 可能抛出 InvalidParamsError
-        limit = RedLineInterceptors.check_labor_contract_limit(
-            training_cost, total_months, remaining_months
+        return _calc_private_lending(result, rate, simulate_db_failure)
+    if scenario == 'labor_contract':
+        return _calc_labor_contract(result, training_cost, total_months, remaining_months)
+    return _calc_general(result, actual_loss, expectation_loss, mitigation_benefit, discretionary_weight)
+
+
+def calculate_liquidated_damages_batch(
+    arrays: Dict[str, Any],
+    simulate_db_failure: bool = False
+) -> Dict[str, Any]:
+    """
+    批量违约金计算 (向量化版本)
+
+    以数组形式一次性计算多条案件，适用于批量合同审计。不同场景通过布尔掩码分派，
+    公式与 calculate_liquidated_damages 保持一致；红线不再抛出异常，而是体现在 status 中。
+
+    Args:
+        arrays: 字段名 -> 数组 (或标量，将广播至批量长度)。支持字段:
+            scenario, actual_loss, expectation_loss, mitigation_benefit,
+            performance_ratio, fault_score, rate, training_cost,
+            total_months, remaining_months
+        simulate_db_failure: 是否模拟数据库同步失败 (仅影响民间借贷场景)
+
+    Returns:
+        {"final_suggestion": ndarray[float], "status": ndarray[int]}
+        status 取值为 ErrorCode.value，触犯红线或参数非法时为 INVALID_PARAMS，
+        对应的 final_suggestion 为 NaN。
+    """
+    import numpy as np
+
+    lengths = [np.size(v) for v in arrays.values() if np.ndim(v) > 0]
+    n = max(lengths) if lengths else 1
+
+    def column(key: str, default: Any, dtype: Any = float) -> Any:
+        return np.broadcast_to(np.asarray(arrays.get(key, default), dtype=dtype), (n,))
+
+    scenario = column('scenario', 'general_contract', dtype=object)
+    final = np.full(n, np.nan)
+    status = np.full(n, ErrorCode.SUCCESS.value, dtype=np.int64)
+
+    lending = scenario == 'private_lending'
+    labor = scenario == 'labor_contract'
+    general = ~(lending | labor)
+
+    # 1. 通用/商业合同: Penalty = max(L, 0) * (1 + 0.3 * max(1 - performance, 0) * fault)
+    if general.any():
+        L = np.maximum(
+            column('actual_loss', 0.0) + column('expectation_loss', 0.0) - column('mitigation_benefit', 0.0),
+            0.0
         )
-        
-        # 劳动合同违约金直接应用此上限
-        result['adjustments'].append({
-             "message": f"劳动合同违约金上限为服务期尚未履行部分所应分摊的培训费用 ({limit:.2f})。",
-             "legal_basis": "《中华人民共和国劳动合同法》第二十二条",
-        })
-        result['final_suggestion'] = limit
-        return result
-
-    # 2. 通用/商业合同计算逻辑
-    
-    # 基础公式计算 L = Actual_Loss + Expectation_Loss - Mitigation_Benefit
-    L = actual_loss + expectation_loss - mitigation_benefit
-    if L < 0:
-        L = 0.0
-    
-    result['base_loss_L'] = L
-    
-    # 计算调整系数 gamma
-    gamma = 0.0
-    
-    if discretionary_weight:
-        # w1: 履行进度修正 (1 - performance_ratio)
-        w1 = 1.0 - discretionary_weight.performance_ratio
-        if w1 < 0: w1 = 0.0 # 防御性编程
-        
-        # w2: 过错程度修正 (fault_score 1.0-2.0)
-        w2 = discretionary_weight.fault_score
-        
-        # gamma 公式: gamma = 0.3 * w1 * w2
-        gamma = 0.3 * w1 * w2
-        
-        result['gamma_calculation'] = {
-            "w1 (1 - performance)": w1,
-            "w2 (fault_score)": w2,
-            "gamma": gamma
-        }
-        
-        # 消费者合同特殊标记
-        if discretionary_weight.is_consumer_contract:
-            result['adjustments'].append({
-                "type": "consumer_protection",
-                "message": "消费者合同，建议法院在裁量时更加倾向于保护消费者权益，严格审查格式条款。",
-                "legal_basis": "《消费者权益保护法》"
-            })
+        w1 = np.maximum(1.0 - column('performance_ratio', 1.0), 0.0)
+        penalty = L * (1.0 + 0.3 * w1 * column('fault_score', 1.0))
+        final[general] = penalty[general]
 
-    # 最终金额 Penalty = L * (1 + gamma)
-    penalty = L * (1.0 + gamma)
-    
-    result['final_suggestion'] = penalty
+    # 2. 民间借贷: LPR 4倍封顶
+    if lending.any():
+        limit = RedLineInterceptors.get_latest_lpr(simulate_db_failure) * 4
+        rate = column('rate', 0.0)
+        exceeded = lending & (rate > limit)
+        final[lending & ~exceeded] = rate[lending & ~exceeded]
+        status[exceeded] = ErrorCode.INVALID_PARAMS.value
 
-    return result
+    # 3. 劳动合同: (Training_Cost / Total_Months) * Remaining_Months
+    if labor.any():
+        total_months = column('total_months', 12)
+        invalid = labor & (total_months <= 0)
+        valid = labor & ~invalid
+        final[valid] = (
+            column('training_cost', 0.0)[valid] / total_months[valid] * column('remaining_months', 0)[valid]
+        )
+        status[invalid] = ErrorCode.INVALID_PARAMS.value
+
+    return {"final_suggestion": final, "status": status}
@@ -5,6 +5,8 @@ MCP-Legal-China 配置管理模块
 """
 
 import os
+import sys
+from functools import lru_cache
 from typing import Dict, Any
 from pathlib import Path
 
@@ -40,15 +42,31 @@ class Config:
     # 风险评估阈值
     PENALTY_THRESHOLD = float(os.getenv("PENALTY_THRESHOLD", "0.3"))  # 违约金阈值 30%
     
+    # 目录是否已创建 (每个进程只需 mkdir 一次)
+    _dirs_ensured = False
+    
     @classmethod
     def ensure_directories(cls):
         """确保所有必要的目录存在"""
+        if cls._dirs_ensured:
+            return
         for directory in [cls.RULES_DIR, cls.TOOLS_DIR, cls.TESTS_DIR, cls.DOCS_DIR]:
             directory.mkdir(exist_ok=True)
+        cls._dirs_ensured = True
     
     @classmethod
     def get_config_dict(cls) -> Dict[str, Any]:
-        """获取配置字典"""
+        """获取配置字典 (结果会被缓存，调用方不应修改)"""
+        return _cached_config_dict(cls)
+    
+    @classmethod
+    def validate(cls) -> bool:
+        """验证配置是否有效 (结果会被缓存)"""
+        return _cached_validate(cls)
+    
+    @classmethod
+    def _build_config_dict(cls) -> Dict[str, Any]:
+        """构建配置字典"""
         return {
             "server_name": cls.SERVER_NAME,
             "server_version": cls.SERVER_VERSION,
@@ -59,19 +77,31 @@ class Config:
         }
     
     @classmethod
-    def validate(cls) -> bool:
-        """验证配置是否有效"""
+    def _validate(cls) -> bool:
+        """执行配置校验"""
         # 检查必要的目录
         cls.ensure_directories()
         
         # 如果配置了 API Key,验证其格式
         if cls.TIANYANCHA_API_KEY and len(cls.TIANYANCHA_API_KEY) < 10:
-            print("⚠️  警告: TIANYANCHA_API_KEY 格式可能不正确")
+            # 校验在模块加载时执行，此时 stdout 可能已是 MCP stdio 通道，警告写到 stderr
+            print("⚠️  警告: TIANYANCHA_API_KEY 格式可能不正确", file=sys.stderr)
             return False
         
         return True
 
 
+# classmethod 无法直接套用 lru_cache，因此以配置类为键缓存在模块级函数上
+@lru_cache(maxsize=None)
+def _cached_config_dict(config_cls: type) -> Dict[str, Any]:
+    return config_cls._build_config_dict()
+
+
+@lru_cache(maxsize=None)
+def _cached_validate(config_cls: type) -> bool:
+    return config_cls._validate()
+
+
 # 在模块加载时验证配置
 if __name__ != "__main__":
     Config.validate()
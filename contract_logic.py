@@ -12,76 +12,205 @@ MCP-Legal-China Contract Logic
 """
 
 import json
-import os
+import re
 import logging
-from typing import Dict, Any, List, Optional
-from errors import InvalidParamsError
+import itertools
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Final
+from config import Config
 from Logic import calculate_liquidated_damages, DiscretionaryWeight
-from legal_resources import LegalResourceProvider
+from legal_resources import LegalResourceProvider, CONTRACT_CHECKLIST, PENALTY_RULES, PID_PREFIX, MCP_LEGAL_PREFIX
+
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick 为可选依赖，未安装时退化为逐个子串匹配
+    ahocorasick = None
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# check_contract_risk 与 analyze_legal_clause 使用的全部关键词，第 i 个关键词对应位掩码中的第 i 位
+_RISK_KEYWORDS = (
+    "纽约", "New York", "香港", "Hong Kong",
+    "违约金", "赔偿", "100%", "全额",
+    "不承担任何责任", "免除全部责任",
+    "北京", "上海", "深圳", "广州",
+)
+_KEYWORD_BITS: Final[Dict[str, int]] = {keyword: 1 << idx for idx, keyword in enumerate(_RISK_KEYWORDS)}
+
+
+def _keyword_mask(*keywords: str) -> int:
+    """由关键词构造位掩码"""
+    mask = 0
+    for keyword in keywords:
+        mask |= _KEYWORD_BITS[keyword]
+    return mask
+
+
+_MASK_JURISD_FOREIGN = _keyword_mask("纽约", "New York")
+_MASK_JURISD_HK = _keyword_mask("香港", "Hong Kong")
+_MASK_PENALTY_CLAUSE = _keyword_mask("违约金", "赔偿")
+_MASK_PENALTY_EXCESSIVE = _keyword_mask("100%", "全额")
+_MASK_LIABILITY_WAIVER = _keyword_mask("不承担任何责任", "免除全部责任")
+_MASK_JURISD_DOMESTIC = _keyword_mask("北京", "上海", "深圳", "广州")
+
+_MASK_CHECK_JURISDICTION = _MASK_JURISD_FOREIGN | _MASK_JURISD_HK
+_MASK_CHECK_PENALTY = _MASK_PENALTY_CLAUSE | _MASK_PENALTY_EXCESSIVE
+_MASK_CHECK_LIABILITY = _MASK_LIABILITY_WAIVER
+
+# 每种检查类型关心的关键词位；未请求的检查类型不参与扫描。
+# 各类型的位互不重叠且非零，合并后的掩码同时记录了请求了哪些检查类型
+_CHECK_TYPE_MASKS: Final[Dict[str, int]] = {
+    "jurisdiction": _MASK_CHECK_JURISDICTION,
+    "penalty": _MASK_CHECK_PENALTY,
+    "liability": _MASK_CHECK_LIABILITY,
+}
+
+# 风险关键词自动机 (Aho-Corasick)，模块加载时构建一次，一次线性扫描即可找出全部命中的关键词
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _bit in _KEYWORD_BITS.items():
+        _KEYWORD_AUTOMATON.add_word(_keyword, _bit)
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_AUTOMATON = None
+
+# 未安装 pyahocorasick 时使用的编译正则 (关键词之间互不重叠，findall 不会漏检)
+_RISK_KEYWORDS_RE = re.compile("|".join(re.escape(keyword) for keyword in _RISK_KEYWORDS))
+
+
+def _scan_keywords(text: str) -> int:
+    """扫描文本，返回命中关键词的位掩码"""
+    found = 0
+    if _KEYWORD_AUTOMATON is not None:
+        for _, bit in _KEYWORD_AUTOMATON.iter(text):
+            found |= bit
+    else:
+        for keyword in _RISK_KEYWORDS_RE.findall(text):
+            found |= _KEYWORD_BITS[keyword]
+    return found
+
+# 静态风险发现模板：与输入无关，模块加载时构建一次 (Final 只防止重新绑定名称)；
+# check_contract_risk 在返回前逐条浅复制，结果 (及写入 PID 记录的副本) 不与模板共享
+_RISK_JURISD_NY: Final[Dict[str, str]] = {"type": "jurisdiction", "level": "高风险", "description": "检测到非中国境内管辖权条款", "suggestion": "建议修改为: 北京仲裁委员会或上海仲裁委员会"}
+_RISK_JURISD_HK: Final[Dict[str, str]] = {"type": "jurisdiction", "level": "中风险", "description": "检测到香港管辖权条款", "suggestion": "如涉及内地业务,建议使用内地仲裁机构"}
+_RISK_NO_PENALTY: Final[Dict[str, str]] = {"type": "penalty", "level": "中风险", "description": "未检测到违约金或赔偿条款", "suggestion": "建议根据《民法典》第585条增加违约金约定"}
+_RISK_HIGH_PENALTY: Final[Dict[str, str]] = {"type": "penalty", "level": "高风险", "description": "违约金比例可能过高", "suggestion": "根据司法实践,违约金一般不超过合同金额的30%"}
+_RISK_LIABILITY_WAIVER: Final[Dict[str, str]] = {"type": "liability", "level": "高风险", "description": "检测到可能无效的免责条款", "suggestion": "根据《民法典》第506条,免除故意或重大过失责任的条款无效"}
+
+# ==================== Static Resources ====================
+# 静态资源内容不随请求变化，在模块加载时一次性构建并序列化
+
+_CIVIL_CODE_CONTRACT: Final[str] = """# 《中华人民共和国民法典》合同编 (摘要)
+
+## 第585条 违约金
+
+当事人可以约定一方违约时应当根据违约情况向对方支付一定数额的违约金,也可以约定因违约产生的损失赔偿额的计算方法。
+
+约定的违约金低于造成的损失的,人民法院或者仲裁机构可以根据当事人的请求予以增加;约定的违约金过分高于造成的损失的,人民法院或者仲裁机构可以根据当事人的请求予以适当减少。
+
+## 第506条 免责条款的效力
+
+合同中的下列免责条款无效:
+(一) 造成对方人身损害的;
+(二) 因故意或者重大过失造成对方财产损失的。
+
+## 第577条 违约责任
+
+当事人一方不履行合同义务或者履行合同义务不符合约定的,应当承担继续履行、采取补救措施或者赔偿损失等违约责任。
+"""
+
+# 审查清单与违约金规则与 legal:// 静态资源同源，直接复用 legal_resources 中的常量
+_CONTRACT_CHECKLIST: Final[Dict[str, List[str]]] = CONTRACT_CHECKLIST
+_PENALTY_RULES: Final[Dict[str, Any]] = PENALTY_RULES
+
+_CONTRACT_CHECKLIST_JSON: Final[str] = json.dumps(_CONTRACT_CHECKLIST, ensure_ascii=False, indent=2)
+_PENALTY_RULES_JSON: Final[str] = json.dumps(_PENALTY_RULES, ensure_ascii=False, indent=2)
+
+# get_legal_suggestion 使用的建议表：各条目用 MappingProxyType 冻结、建议列表存为元组，
+# 共享的常量无法被修改；get_legal_suggestion 返回可修改的副本
+_SUGGESTIONS: Final[Mapping[str, Mapping[str, Any]]] = MappingProxyType({
+    "jurisdiction": MappingProxyType({
+        "title": "管辖权条款建议",
+        "recommendations": (
+            "优先选择仲裁方式解决争议,效率更高",
+            "建议选择: 北京仲裁委员会、上海仲裁委员会、深圳国际仲裁院",
+            "如选择诉讼,应选择与合同履行地或被告住所地有关的法院"
+        ),
+        "template": "因本合同引起的或与本合同有关的任何争议,均应提交[北京仲裁委员会]按照其仲裁规则进行仲裁。仲裁裁决是终局的,对双方均有约束力。"
+    }),
+    "penalty": MappingProxyType({
+        "title": "违约金条款建议",
+        "recommendations": (
+            "违约金数额应当合理,一般不超过实际损失的30%",
+            "可以约定违约金的计算方法,如按日计算",
+            "建议同时约定损害赔偿的计算方法"
+        ),
+        "template": "一方违约的,应向守约方支付违约金,违约金金额为合同总价款的[10%-30%]。违约金不足以弥补实际损失的,守约方有权要求赔偿实际损失。"
+    }),
+    "liability": MappingProxyType({
+        "title": "责任条款建议",
+        "recommendations": (
+            "不得免除故意或重大过失造成的责任",
+            "责任限制应当公平合理",
+            "建议明确不可抗力的处理方式"
+        ),
+        "template": "除因故意或重大过失造成的损失外,任何一方对本合同项下的间接损失、预期利润损失不承担赔偿责任。"
+    }),
+    "general": MappingProxyType({
+        "title": "通用法律建议",
+        "recommendations": (
+            "确保合同各方主体资格合法",
+            "明确合同标的、数量、质量、价款等主要条款",
+            "约定明确的履行期限和履行方式",
+            "建议聘请专业律师进行合同审查"
+        )
+    })
+})
+
 class ContractLogic:
     """法律业务逻辑处理类"""
 
-    def __init__(self):
-        # 法律规则库路径 (如果有需要的话)
-        self.rules_path = os.path.join(os.path.dirname(__file__), "rules")
+    # 法律规则库路径 (如果有需要的话)，统一取自 Config，模块加载时计算一次
+    rules_path = Config.RULES_DIR
 
     # ==================== Tools Logic ====================
 
-    def check_contract_risk(self, contract_text: str, check_types: List[str]) -> Dict[str, Any]:
+    def check_contract_risk(self, contract_text: str, check_types: Iterable[str]) -> Dict[str, Any]:
         """
         检查合同风险
         """
-        risks = []
+        # 风险发现取自模块级模板，放入结果时复制：调用方修改结果 (如本地化 suggestion) 不会影响后续报告
+        risks: List[Dict[str, str]] = []
+
+        # 一次遍历 check_types 得到请求类型的掩码，之后的类型判断均为整数与运算，不再逐个扫描列表
+        type_mask = 0
+        for check_type in check_types:
+            type_mask |= _CHECK_TYPE_MASKS.get(check_type, 0)
+        found = _scan_keywords(contract_text) & type_mask if type_mask else 0
 
         # 检查管辖权
-        if "jurisdiction" in check_types:
-            if "纽约" in contract_text or "New York" in contract_text:
-                risks.append({
-                    "type": "jurisdiction",
-                    "level": "高风险",
-                    "description": "检测到非中国境内管辖权条款",
-                    "suggestion": "建议修改为: 北京仲裁委员会或上海仲裁委员会"
-                })
-            elif "香港" in contract_text or "Hong Kong" in contract_text:
-                risks.append({
-                    "type": "jurisdiction",
-                    "level": "中风险",
-                    "description": "检测到香港管辖权条款",
-                    "suggestion": "如涉及内地业务,建议使用内地仲裁机构"
-                })
+        if type_mask & _MASK_CHECK_JURISDICTION:
+            if found & _MASK_JURISD_FOREIGN:
+                risks.append(_RISK_JURISD_NY.copy())
+            elif found & _MASK_JURISD_HK:
+                risks.append(_RISK_JURISD_HK.copy())
 
         # 检查违约金
-        if "penalty" in check_types:
-            if "违约金" not in contract_text and "赔偿" not in contract_text:
-                risks.append({
-                    "type": "penalty",
-                    "level": "中风险",
-                    "description": "未检测到违约金或赔偿条款",
-                    "suggestion": "建议根据《民法典》第585条增加违约金约定"
-                })
+        if type_mask & _MASK_CHECK_PENALTY:
+            if not found & _MASK_PENALTY_CLAUSE:
+                risks.append(_RISK_NO_PENALTY.copy())
 
             # 检查违约金比例
-            if "100%" in contract_text or "全额" in contract_text:
-                risks.append({
-                    "type": "penalty",
-                    "level": "高风险",
-                    "description": "违约金比例可能过高",
-                    "suggestion": "根据司法实践,违约金一般不超过合同金额的30%"
-                })
+            if found & _MASK_PENALTY_EXCESSIVE:
+                risks.append(_RISK_HIGH_PENALTY.copy())
 
         # 检查责任条款
-        if "liability" in check_types:
-            if "不承担任何责任" in contract_text or "免除全部责任" in contract_text:
-                risks.append({
-                    "type": "liability",
-                    "level": "高风险",
-                    "description": "检测到可能无效的免责条款",
-                    "suggestion": "根据《民法典》第506条,免除故意或重大过失责任的条款无效"
-                })
+        if type_mask & _MASK_CHECK_LIABILITY:
+            if found & _MASK_LIABILITY_WAIVER:
+                risks.append(_RISK_LIABILITY_WAIVER.copy())
 
         # 生成报告
         if not risks:
@@ -123,7 +252,7 @@ class ContractLogic:
         elif clause_type == "jurisdiction":
             analysis["legal_basis"].append("《民事诉讼法》第34条 - 协议管辖")
 
-            if any(place in clause_text for place in ["北京", "上海", "深圳", "广州"]):
+            if _scan_keywords(clause_text) & _MASK_JURISD_DOMESTIC:
                 analysis["compliance_status"] = "合规"
             else:
                 analysis["suggestions"].append("建议选择与合同有实际联系的地点")
@@ -132,125 +261,26 @@ class ContractLogic:
 
     def get_legal_suggestion(self, risk_type: str, context: str) -> Dict[str, Any]:
         """获取法律建议"""
-        suggestions = {
-            "jurisdiction": {
-                "title": "管辖权条款建议",
-                "recommendations": [
-                    "优先选择仲裁方式解决争议,效率更高",
-                    "建议选择: 北京仲裁委员会、上海仲裁委员会、深圳国际仲裁院",
-                    "如选择诉讼,应选择与合同履行地或被告住所地有关的法院"
-                ],
-                "template": "因本合同引起的或与本合同有关的任何争议,均应提交[北京仲裁委员会]按照其仲裁规则进行仲裁。仲裁裁决是终局的,对双方均有约束力。"
-            },
-            "penalty": {
-                "title": "违约金条款建议",
-                "recommendations": [
-                    "违约金数额应当合理,一般不超过实际损失的30%",
-                    "可以约定违约金的计算方法,如按日计算",
-                    "建议同时约定损害赔偿的计算方法"
-                ],
-                "template": "一方违约的,应向守约方支付违约金,违约金金额为合同总价款的[10%-30%]。违约金不足以弥补实际损失的,守约方有权要求赔偿实际损失。"
-            },
-            "liability": {
-                "title": "责任条款建议",
-                "recommendations": [
-                    "不得免除故意或重大过失造成的责任",
-                    "责任限制应当公平合理",
-                    "建议明确不可抗力的处理方式"
-                ],
-                "template": "除因故意或重大过失造成的损失外,任何一方对本合同项下的间接损失、预期利润损失不承担赔偿责任。"
-            },
-            "general": {
-                "title": "通用法律建议",
-                "recommendations": [
-                    "确保合同各方主体资格合法",
-                    "明确合同标的、数量、质量、价款等主要条款",
-                    "约定明确的履行期限和履行方式",
-                    "建议聘请专业律师进行合同审查"
-                ]
-            }
-        }
-
-        result = suggestions.get(risk_type, suggestions["general"])
+        base = _SUGGESTIONS.get(risk_type, _SUGGESTIONS["general"])
+        # 建议表已冻结，返回可修改的副本 (建议元组转为列表，序列化结果不变)
+        suggestion = {**base, "recommendations": list(base["recommendations"])}
         if context:
-            result["context"] = context
-
-        return result
+            suggestion["context"] = context
+        return suggestion
 
     # ==================== Resources Logic ====================
 
     def get_civil_code_contract(self) -> str:
         """获取民法典合同编相关内容"""
-        return """# 《中华人民共和国民法典》合同编 (摘要)
-
-## 第585条 违约金
-
-当事人可以约定一方违约时应当根据违约情况向对方支付一定数额的违约金,也可以约定因违约产生的损失赔偿额的计算方法。
-
-约定的违约金低于造成的损失的,人民法院或者仲裁机构可以根据当事人的请求予以增加;约定的违约金过分高于造成的损失的,人民法院或者仲裁机构可以根据当事人的请求予以适当减少。
-
-## 第506条 免责条款的效力
-
-合同中的下列免责条款无效:
-(一) 造成对方人身损害的;
-(二) 因故意或者重大过失造成对方财产损失的。
-
-## 第577条 违约责任
-
-当事人一方不履行合同义务或者履行合同义务不符合约定的,应当承担继续履行、采取补救措施或者赔偿损失等违约责任。
-"""
+        return _CIVIL_CODE_CONTRACT
 
     def get_contract_checklist(self) -> str:
         """获取合同审查清单"""
-        checklist = {
-            "基本信息审查": [
-                "合同各方主体资格是否合法",
-                "合同名称是否准确反映合同性质",
-                "合同签订日期和生效日期是否明确"
-            ],
-            "主要条款审查": [
-                "合同标的是否明确",
-                "数量、质量标准是否清晰",
-                "价款或报酬及支付方式是否约定",
-                "履行期限、地点和方式是否明确"
-            ],
-            "风险条款审查": [
-                "违约责任是否约定",
-                "争议解决方式是否明确",
-                "保密条款是否完善",
-                "知识产权归属是否清晰"
-            ],
-            "合规性审查": [
-                "是否违反法律强制性规定",
-                "免责条款是否有效",
-                "管辖权约定是否合法",
-                "是否需要政府审批或备案"
-            ]
-        }
-        return json.dumps(checklist, ensure_ascii=False, indent=2)
+        return _CONTRACT_CHECKLIST_JSON
 
     def get_penalty_rules(self) -> str:
         """获取违约金评估规则"""
-        rules = {
-            "法律依据": "《民法典》第585条",
-            "基本原则": "违约金应当与实际损失相当,不得过分高于实际损失",
-            "司法实践标准": {
-                "一般标准": "违约金不超过实际损失的30%",
-                "特殊情况": "在某些商事合同中,可能允许更高比例",
-                "调整机制": "当事人可以请求法院或仲裁机构调整过高或过低的违约金"
-            },
-            "计算方法": [
-                "按合同总价款的百分比计算",
-                "按日计算 (如每日万分之五)",
-                "按实际损失的倍数计算"
-            ],
-            "注意事项": [
-                "违约金与损害赔偿不能同时主张",
-                "违约金过高的举证责任在违约方",
-                "可以约定违约金的上限"
-            ]
-        }
-        return json.dumps(rules, ensure_ascii=False, indent=2)
+        return _PENALTY_RULES_JSON
 
     # ==================== Prompts Logic ====================
 
@@ -330,13 +360,25 @@ class ContractLogic:
 请生成一份完整的企业风险评估报告,包含以上所有维度的分析。
 """
 
-def resolve_pid_or_value(value: Any, provider: LegalResourceProvider) -> Any:
+# 评估编号计数器：单调递增，不会像 id() 那样在对象回收后被复用
+_eval_counter = itertools.count().__next__
+
+
+@lru_cache(maxsize=1)
+def _default_resource_provider() -> LegalResourceProvider:
+    """进程内共享的默认资源提供者，避免每次评估都重新构造并读取 PID 存储"""
+    return LegalResourceProvider()
+
+
+def resolve_pid_or_value(value: Any, provider: LegalResourceProvider, warn: bool = True) -> Any:
     """
     Helper to resolve a value that might be a PID string.
     If value is a string starting with "legal://pid/", tries to resolve it.
     Otherwise returns the value as is.
+    Unresolvable PIDs return None; pass warn=False to skip the per-call warning
+    when the caller reports failures itself.
     """
-    if isinstance(value, str) and value.startswith("legal://pid/"):
+    if value.__class__ is str and value.startswith(PID_PREFIX):
         resource = provider.get_resource_by_pid(value)
         if resource:
             # Assuming the resource content has a 'value' field or is the value itself
@@ -344,7 +386,8 @@ def resolve_pid_or_value(value: Any, provider: LegalResourceProvider) -> Any:
             # and we look for specific fields or return the whole thing if it's a primitive
             return resource
         else:
-            logger.warning(f"Failed to resolve PID: {value}")
+            if warn:
+                logger.warning("Failed to resolve PID: %s", value)
             return None
     return value
 
@@ -370,32 +413,40 @@ def evaluate_judicial_discretion(
     """
     
     if resource_provider is None:
-        resource_provider = LegalResourceProvider()
+        resource_provider = _default_resource_provider()
 
     # 1. Resolve Inputs (PIDs or raw values)
     # We expect resolved PIDs to ideally return a dictionary with a 'value' key, 
     # or we handle raw numeric inputs.
     
-    def extract_value(param, key_name='amount'):
-        resolved = resolve_pid_or_value(param, resource_provider)
+    # 三个参数一次遍历解析为 (value, pid)，不再为每个参数单独创建闭包调用
+    resolved_inputs = []
+    unresolved_pids = []
+    for param, key_name in ((loss_param, 'amount'), (performance_param, 'ratio'), (fault_param, 'score')):
+        is_str = param.__class__ is str
+        resolved = resolve_pid_or_value(param, resource_provider, warn=False) if is_str else param
+        if resolved is None and is_str:
+            unresolved_pids.append(param)
         if isinstance(resolved, dict):
-            return float(resolved.get(key_name, 0.0)), param if isinstance(param, str) and param.startswith("legal://") else None
-        if isinstance(resolved, (int, float)):
-            return float(resolved), None
-        return 0.0, None
+            resolved_inputs.append((float(resolved.get(key_name, 0.0)), param if is_str and param.startswith(MCP_LEGAL_PREFIX) else None))
+        elif isinstance(resolved, (int, float)):
+            resolved_inputs.append((float(resolved), None))
+        else:
+            resolved_inputs.append((0.0, None))
 
-    loss_value, loss_pid = extract_value(loss_param, 'amount')
-    performance_value, performance_pid = extract_value(performance_param, 'ratio')
-    fault_value, fault_pid = extract_value(fault_param, 'score')
+    (loss_value, loss_pid), (performance_value, performance_pid), (fault_value, fault_pid) = resolved_inputs
+    if unresolved_pids:
+        # 每次评估最多记录一条告警，而不是每个参数一条
+        logger.warning("Failed to resolve PIDs: %s", ", ".join(unresolved_pids))
 
     # 2. Validate Inputs
     if performance_value < 0.0 or performance_value > 1.0:
         # Clamp or raise? Let's clamp for robustness but log warning
-        logger.warning(f"Performance value {performance_value} out of range, clamping to [0, 1]")
+        logger.warning("Performance value %s out of range, clamping to [0, 1]", performance_value)
         performance_value = max(0.0, min(1.0, performance_value))
         
     if fault_value < 1.0 or fault_value > 2.0:
-        logger.warning(f"Fault value {fault_value} out of range, clamping to [1, 2]")
+        logger.warning("Fault value %s out of range, clamping to [1, 2]", fault_value)
         fault_value = max(1.0, min(2.0, fault_value))
 
     # 3. Construct DiscretionaryWeight object for Logic.py
@@ -423,7 +474,7 @@ def evaluate_judicial_discretion(
     standards_uri = "legal://judicial-discretion/standards"
     
     final_report = {
-        "evaluation_id": f"eval-{id(calculation_result)}", # Simple ID
+        "evaluation_id": f"eval-{_eval_counter():x}",
         "contract_pid": contract_pid,
         "standards_reference": standards_uri,
         "inputs": {
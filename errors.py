@@ -10,6 +10,8 @@ class ErrorCode(Enum):
     UNKNOWN_ERROR = 9999
 
 class AppError(Exception):
+    __slots__ = ("code", "message", "details")
+
     def __init__(self, code: ErrorCode, message: str, details: Optional[Dict[str, Any]] = None):
         self.code = code
         self.message = message
@@ -24,18 +26,36 @@ class AppError(Exception):
             "details": self.details
         }
 
+    def __reduce__(self):
+        # 槽位属性不在 __dict__ 中，需显式提供重建参数以支持 pickle
+        return _restore_app_error, (self.__class__, self.code, self.message, self.details)
+
+
+def _restore_app_error(cls, code: ErrorCode, message: str, details: Dict[str, Any]) -> AppError:
+    error = cls.__new__(cls)
+    AppError.__init__(error, code, message, details)
+    return error
+
 class InvalidParamsError(AppError):
+    __slots__ = ()
+
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(ErrorCode.INVALID_PARAMS, message, details)
 
 class DBSyncError(AppError):
+    __slots__ = ()
+
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(ErrorCode.DB_SYNC_ERROR, message, details)
 
 class ElicitationRequiredError(AppError):
+    __slots__ = ()
+
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(ErrorCode.ELICITATION_REQUIRED, message, details)
 
 class InternalError(AppError):
+    __slots__ = ()
+
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(ErrorCode.INTERNAL_ERROR, message, details)
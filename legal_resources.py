@@ -6,14 +6,38 @@ JSON-LD formatting, and PID (Persistent Identifier) support.
 """
 
 import json
-import uuid
+import secrets
+import time
 import os
 import hashlib
+import mmap
+import threading
+from collections import OrderedDict
+from functools import cached_property
 from typing import Dict, Any, Optional, List
-from datetime import datetime
-from logger_config import setup_logger, get_trace_id
+from logger_config import setup_logger
 from errors import InvalidParamsError
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; fall back to the stdlib encoder when it is missing
+    orjson = None
+
+try:
+    from blake3 import blake3 as _blake3
+    CONTENT_HASH_ALGORITHM = "blake3"
+except ImportError:
+    # blake3 is optional; SHA-256 is used for content hashes when it is missing
+    _blake3 = None
+    CONTENT_HASH_ALGORITHM = "sha256"
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is POSIX-only; without it the PID store is not guarded against concurrent writers
+    fcntl = None
+
 # Initialize logger
 logger = setup_logger()
 
@@ -21,6 +45,166 @@ logger = setup_logger()
 PID_FILE_PATH = "pids.json"
 MCP_LEGAL_PREFIX = "legal://"
 PID_PREFIX = "legal://pid/"
+# The PID journal is compacted into the snapshot once it holds at least this many
+# records and more records than the snapshot itself (keeps appends amortized O(1)).
+PID_COMPACT_MIN_RECORDS = 64
+# Maximum number of rendered PID JSON-LD documents kept in the LRU cache
+PID_JSONLD_CACHE_SIZE = 256
+
+
+def _dumps_pretty(obj: Any) -> str:
+    """Serialize to indented, non-ASCII-preserving JSON (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def _dumps_line(obj: Any) -> bytes:
+    """Serialize to a single JSON line (UTF-8 bytes, newline-terminated)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    """Parse JSON from UTF-8 bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _read_json_file(path: str) -> Any:
+    """Parse a JSON file straight from a read-only memory map, without a text decode pass."""
+    with open(path, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return json.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO-8601 with microseconds and a Z suffix, without building a datetime."""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    t = time.gmtime(seconds)
+    return "%04d-%02d-%02dT%02d:%02d:%02d.%06dZ" % (
+        t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, nanos // 1000
+    )
+
+
+def _content_hash(content: Any) -> str:
+    """Hash the canonical (sorted-key, compact) JSON form of content."""
+    if orjson is not None:
+        canonical = orjson.dumps(content, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    else:
+        canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if _blake3 is not None:
+        return _blake3(canonical).hexdigest()
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def _lock(f, exclusive: bool = True):
+    """Take an advisory lock on an open file, if the platform supports it."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+# --- Static Resource Contents (Migrated from server.py) ---
+# Built once at import and shared read-only by every provider instance.
+
+CIVIL_CODE_CONTRACT: Dict[str, Any] = {
+    "title": "中华人民共和国民法典 - 合同编 (摘要)",
+    "articles": [
+        {
+            "id": "585",
+            "title": "违约金",
+            "content": "当事人可以约定一方违约时应当根据违约情况向对方支付一定数额的违约金..."
+        },
+        {
+            "id": "506",
+            "title": "免责条款的效力",
+            "content": "合同中的下列免责条款无效: (一) 造成对方人身损害的; (二) 因故意..."
+        },
+        {
+            "id": "577",
+            "title": "违约责任",
+            "content": "当事人一方不履行合同义务或者履行合同义务不符合约定的..."
+        }
+    ]
+}
+
+CONTRACT_CHECKLIST: Dict[str, Any] = {
+    "基本信息审查": [
+        "合同各方主体资格是否合法",
+        "合同名称是否准确反映合同性质",
+        "合同签订日期和生效日期是否明确"
+    ],
+    "主要条款审查": [
+        "合同标的是否明确",
+        "数量、质量标准是否清晰",
+        "价款或报酬及支付方式是否约定",
+        "履行期限、地点和方式是否明确"
+    ],
+    "风险条款审查": [
+        "违约责任是否约定",
+        "争议解决方式是否明确",
+        "保密条款是否完善",
+        "知识产权归属是否清晰"
+    ],
+    "合规性审查": [
+        "是否违反法律强制性规定",
+        "免责条款是否有效",
+        "管辖权约定是否合法",
+        "是否需要政府审批或备案"
+    ]
+}
+
+PENALTY_RULES: Dict[str, Any] = {
+    "法律依据": "《民法典》第585条",
+    "基本原则": "违约金应当与实际损失相当,不得过分高于实际损失",
+    "司法实践标准": {
+        "一般标准": "违约金不超过实际损失的30%",
+        "特殊情况": "在某些商事合同中,可能允许更高比例",
+        "调整机制": "当事人可以请求法院或仲裁机构调整过高或过低的违约金"
+    },
+    "计算方法": [
+        "按合同总价款的百分比计算",
+        "按日计算 (如每日万分之五)",
+        "按实际损失的倍数计算"
+    ],
+    "注意事项": [
+        "违约金与损害赔偿不能同时主张",
+        "违约金过高的举证责任在违约方",
+        "可以约定违约金的上限"
+    ]
+}
+
+JUDICIAL_DISCRETION_STANDARDS: Dict[str, Any] = {
+    "title": "司法裁量权行使基准",
+    "source": "《全国法院民商事审判工作会议纪要》（九民纪要）及相关司法解释",
+    "factors": {
+        "loss": {
+            "name": "实际损失",
+            "description": "违约行为造成的直接损失和可得利益损失",
+            "weight": "基础基准"
+        },
+        "performance": {
+            "name": "合同履行情况",
+            "description": "已履行部分占合同总义务的比例",
+            "impact": "负相关 (履行越多，违约金调整幅度越大)"
+        },
+        "fault": {
+            "name": "当事人过错程度",
+            "description": "违约方的主观恶意程度 (故意、重大过失、轻微过失)",
+            "impact": "正相关 (过错越大，违约金可能越高)"
+        }
+    },
+    "formula_reference": "V_final = f(Loss, Performance, Fault)",
+    "guidelines": [
+        "以实际损失为基础，兼顾合同的履行情况、当事人的过错程度以及预期利益等综合因素",
+        "约定的违约金超过造成损失的百分之三十的，一般可以认定为过分高于造成的损失"
+    ]
+}
+
 
 class LegalResourceProvider:
     """
@@ -29,86 +213,170 @@ class LegalResourceProvider:
     
     def __init__(self, pid_file_path: str = PID_FILE_PATH):
         self.pid_file_path = pid_file_path
-        self._pids: Dict[str, Dict[str, Any]] = self._load_pids()
+        # New PIDs are appended to a JSON-lines journal next to the snapshot file
+        self.pid_journal_path = pid_file_path + "l" if pid_file_path.endswith(".json") else pid_file_path + ".jsonl"
+        self._snapshot_records = 0
+        self._journal_records = 0
+        # Serializes PID loading, inserts and journal compaction when tools run in worker threads
+        self._pid_lock = threading.RLock()
         self._resources = {
              "legal://civil-code/contract": {
                 "name": "《民法典》合同编",
                 "description": "中国民法典合同编相关条文",
                 "mimeType": "application/json+ld",
-                "loader": self._get_civil_code_contract
+                "content": CIVIL_CODE_CONTRACT
             },
             "legal://templates/contract-checklist": {
                 "name": "合同审查清单",
                 "description": "标准合同审查要点清单",
                 "mimeType": "application/json+ld",
-                "loader": self._get_contract_checklist
+                "content": CONTRACT_CHECKLIST
             },
              "legal://rules/penalty-assessment": {
                  "name": "违约金评估规则",
                  "description": "违约金过高判定标准和计算方法",
                  "mimeType": "application/json+ld",
-                 "loader": self._get_penalty_rules
+                 "content": PENALTY_RULES
              },
              "legal://judicial-discretion/standards": {
                  "name": "司法裁量权基准",
                  "description": "基于《九民纪要》与司法解释的裁量权行使标准",
                  "mimeType": "application/json+ld",
-                 "loader": self._get_judicial_discretion_standards
+                 "content": JUDICIAL_DISCRETION_STANDARDS
              }
          }
+        # Static resources only change through register_resource, so their JSON-LD is rendered on first access and reused
+        self._static_jsonld: Dict[str, str] = {}
+        # Bumped whenever the static resource set changes, so callers can refresh cached listings
+        self.resources_version = 0
+        # PID records are immutable once created; their renderings are kept in a bounded LRU
+        self._pid_jsonld: "OrderedDict[str, str]" = OrderedDict()
+
+    @cached_property
+    def _pids(self) -> Dict[str, Dict[str, Any]]:
+        """PID store, loaded from disk on first access rather than at construction."""
+        with self._pid_lock:
+            # Another thread may have finished loading while we waited for the lock
+            pids = self.__dict__.get("_pids")
+            if pids is None:
+                pids = self.__dict__["_pids"] = self._load_pids()
+            return pids
     
     def _load_pids(self) -> Dict[str, Dict[str, Any]]:
-        """Load PIDs from persistent storage."""
+        """Load PIDs from the snapshot file, then replay the append-only journal."""
+        pids: Dict[str, Dict[str, Any]] = {}
         if os.path.exists(self.pid_file_path):
             try:
-                with open(self.pid_file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                pids = _read_json_file(self.pid_file_path)
             except Exception as e:
                 logger.error(f"Failed to load PIDs from {self.pid_file_path}: {e}")
-                return {}
-        return {}
+                pids = {}
+        self._snapshot_records = len(pids)
+
+        if os.path.exists(self.pid_journal_path):
+            try:
+                with open(self.pid_journal_path, 'rb') as f:
+                    _lock(f, exclusive=False)
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = _loads(line)
+                        except ValueError:
+                            # A torn trailing line from an interrupted write; skip it
+                            logger.warning(f"Skipping malformed PID journal line in {self.pid_journal_path}")
+                            continue
+                        pids[record["handle"]] = record
+                        self._journal_records += 1
+            except Exception as e:
+                logger.error(f"Failed to load PID journal from {self.pid_journal_path}: {e}")
+        return pids
+
+    def _append_pid(self, record: Dict[str, Any]):
+        """Append a single PID record to the journal (O(1) per insert)."""
+        try:
+            with open(self.pid_journal_path, 'ab') as f:
+                _lock(f)
+                f.write(_dumps_line(record))
+            self._journal_records += 1
+        except Exception as e:
+            logger.error(f"Failed to append PID to {self.pid_journal_path}: {e}")
+            return
+
+        if self._journal_records >= max(PID_COMPACT_MIN_RECORDS, self._snapshot_records):
+            self._compact_pids()
+
+    def _compact_pids(self):
+        """Fold the journal into the snapshot file and truncate the journal."""
+        try:
+            with open(self.pid_journal_path, 'a+b') as journal:
+                _lock(journal)
+                # Pick up records other writers appended since we loaded
+                journal.seek(0)
+                for line in journal:
+                    try:
+                        record = _loads(line)
+                    except ValueError:
+                        continue
+                    self._pids.setdefault(record["handle"], record)
+                self._save_pids()
+                journal.truncate(0)
+            self._snapshot_records = len(self._pids)
+            self._journal_records = 0
+        except Exception as e:
+            logger.error(f"Failed to compact PIDs into {self.pid_file_path}: {e}")
 
     def _save_pids(self):
-        """Save PIDs to persistent storage."""
+        """Atomically write all in-memory PIDs to the snapshot file."""
+        tmp_path = self.pid_file_path + ".tmp"
         try:
-            with open(self.pid_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self._pids, f, ensure_ascii=False, indent=2)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(_dumps_pretty(self._pids))
+            os.replace(tmp_path, self.pid_file_path)
         except Exception as e:
             logger.error(f"Failed to save PIDs to {self.pid_file_path}: {e}")
+            raise
 
     def generate_pid(self, content: Any, metadata: Dict[str, Any], parent_pid: Optional[str] = None) -> str:
         """
         Generate a persistent identifier (PID) for a resource.
-        Currently uses a simple UUID-based handle mechanism.
+        Handles are 128 random bits from the secrets CSPRNG, hyphenated like a UUID.
         
         Args:
             content: The content of the resource.
             metadata: Metadata associated with the resource.
             parent_pid: Optional PID of the parent resource (for chaining).
         """
-        handle = str(uuid.uuid4())
+        # Handles must stay collision-resistant, so keep a CSPRNG but skip building a UUID object.
+        # Hyphens in the UUID positions keep digit runs short enough that response masking
+        # rarely mistakes part of a handle for a phone, ID card or account number
+        h = secrets.token_hex(16)
+        handle = f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
         pid_uri = f"{PID_PREFIX}{handle}"
         
         # Calculate content hash for integrity
-        content_str = json.dumps(content, sort_keys=True)
-        content_hash = hashlib.sha256(content_str.encode('utf-8')).hexdigest()
+        content_hash = _content_hash(content)
         
         record = {
             "handle": handle,
             "uri": pid_uri,
-            "created_at": datetime.utcnow().isoformat() + "Z",
+            "created_at": _iso_now(),
             "metadata": metadata,
             "content_hash": content_hash,
+            "hash_algorithm": CONTENT_HASH_ALGORITHM,
             "parent_pid": parent_pid,
             # In a real system, we might store the content reference or the content itself if small
             # For this implementation, we'll store the content if it's a dynamic report
             "content": content
         }
         
-        self._pids[handle] = record
-        self._save_pids()
+        with self._pid_lock:
+            self._pids[handle] = record
+            self._append_pid(record)
         
-        logger.info(f"Generated PID: {pid_uri} (Parent: {parent_pid})", extra={"trace_id": get_trace_id()})
+        # No explicit trace_id: the record picks up the calling request's bound trace ID
+        logger.info("Generated PID: %s (Parent: %s)", pid_uri, parent_pid)
         return pid_uri
 
     def get_resource_by_pid(self, pid_uri: str) -> Optional[Dict[str, Any]]:
@@ -136,26 +404,58 @@ class LegalResourceProvider:
             for uri, meta in self._resources.items()
         ]
 
+    def register_resource(self, uri: str, name: str, description: str, content: Any,
+                          mime_type: str = "application/json+ld"):
+        """Register (or replace) a static resource and drop its cached rendering."""
+        self._resources[uri] = {
+            "name": name,
+            "description": description,
+            "mimeType": mime_type,
+            "content": content
+        }
+        self.invalidate(uri)
+        self.resources_version += 1
+
+    def invalidate(self, uri: str):
+        """Drop the cached JSON-LD rendering of a resource (e.g. after a content refresh)."""
+        self._static_jsonld.pop(uri, None)
+        with self._pid_lock:
+            self._pid_jsonld.pop(uri, None)
+
     def get_resource_content(self, uri: str) -> str:
         """
         Get resource content by URI.
         Supports both static resources (legal://...) and PIDs (legal://pid/...).
         Returns JSON-LD formatted string.
         """
-        trace_id = get_trace_id()
-        
+        # Fast path: static resource already rendered
+        jsonld = self._static_jsonld.get(uri)
+        if jsonld is not None:
+             return jsonld
+
         # Check if it's a PID
         if uri.startswith(PID_PREFIX):
+            with self._pid_lock:
+                jsonld = self._pid_jsonld.get(uri)
+                if jsonld is not None:
+                    self._pid_jsonld.move_to_end(uri)
+                    return jsonld
             content = self.get_resource_by_pid(uri)
             if content is None:
                 raise InvalidParamsError(f"PID not found: {uri}")
-            return self.format_as_jsonld(content, uri, "ComplianceReport") # Assuming mostly reports for now
+            jsonld = self.format_as_jsonld(content, uri, "ComplianceReport") # Assuming mostly reports for now
+            with self._pid_lock:
+                self._pid_jsonld[uri] = jsonld
+                if len(self._pid_jsonld) > PID_JSONLD_CACHE_SIZE:
+                    self._pid_jsonld.popitem(last=False)
+            return jsonld
 
         # Check if it's a static resource
         resource_meta = self._resources.get(uri)
         if resource_meta:
-             content = resource_meta["loader"]()
-             return self.format_as_jsonld(content, uri, "Legislation") # Simplified type mapping
+             jsonld = self.format_as_jsonld(resource_meta["content"], uri, "Legislation") # Simplified type mapping
+             self._static_jsonld[uri] = jsonld
+             return jsonld
 
         raise InvalidParamsError(f"Unknown resource: {uri}")
 
@@ -168,7 +468,7 @@ class LegalResourceProvider:
             "@context": "https://schema.org",
             "@type": type_hint,
             "@id": uri,
-            "dateCreated": datetime.utcnow().isoformat() + "Z",
+            "dateCreated": _iso_now(),
             "mainEntity": data
         }
 
@@ -182,108 +482,4 @@ class LegalResourceProvider:
                      "@id": record["parent_pid"]
                  }
         
-        return json.dumps(jsonld, ensure_ascii=False, indent=2)
-
-    # --- Resource Loaders (Migrated from server.py) ---
-
-    def _get_civil_code_contract(self) -> Dict[str, Any]:
-        """Get Civil Code Contract section content."""
-        return {
-            "title": "中华人民共和国民法典 - 合同编 (摘要)",
-            "articles": [
-                {
-                    "id": "585",
-                    "title": "违约金",
-                    "content": "当事人可以约定一方违约时应当根据违约情况向对方支付一定数额的违约金..."
-                },
-                {
-                    "id": "506",
-                    "title": "免责条款的效力",
-                    "content": "合同中的下列免责条款无效: (一) 造成对方人身损害的; (二) 因故意..."
-                },
-                {
-                    "id": "577",
-                    "title": "违约责任",
-                    "content": "当事人一方不履行合同义务或者履行合同义务不符合约定的..."
-                }
-            ]
-        }
-
-    def _get_contract_checklist(self) -> Dict[str, Any]:
-        """Get Contract Review Checklist."""
-        return {
-            "基本信息审查": [
-                "合同各方主体资格是否合法",
-                "合同名称是否准确反映合同性质",
-                "合同签订日期和生效日期是否明确"
-            ],
-            "主要条款审查": [
-                "合同标的是否明确",
-                "数量、质量标准是否清晰",
-                "价款或报酬及支付方式是否约定",
-                "履行期限、地点和方式是否明确"
-            ],
-            "风险条款审查": [
-                "违约责任是否约定",
-                "争议解决方式是否明确",
-                "保密条款是否完善",
-                "知识产权归属是否清晰"
-            ],
-            "合规性审查": [
-                "是否违反法律强制性规定",
-                "免责条款是否有效",
-                "管辖权约定是否合法",
-                "是否需要政府审批或备案"
-            ]
-        }
-
-    def _get_penalty_rules(self) -> Dict[str, Any]:
-        """Get Penalty Assessment Rules."""
-        return {
-            "法律依据": "《民法典》第585条",
-            "基本原则": "违约金应当与实际损失相当,不得过分高于实际损失",
-            "司法实践标准": {
-                "一般标准": "违约金不超过实际损失的30%",
-                "特殊情况": "在某些商事合同中,可能允许更高比例",
-                "调整机制": "当事人可以请求法院或仲裁机构调整过高或过低的违约金"
-            },
-            "计算方法": [
-                "按合同总价款的百分比计算",
-                "按日计算 (如每日万分之五)",
-                "按实际损失的倍数计算"
-            ],
-            "注意事项": [
-                "违约金与损害赔偿不能同时主张",
-                "违约金过高的举证责任在违约方",
-                "可以约定违约金的上限"
-            ]
-        }
-
-    def _get_judicial_discretion_standards(self) -> Dict[str, Any]:
-        """Get Judicial Discretion Standards."""
-        return {
-            "title": "司法裁量权行使基准",
-            "source": "《全国法院民商事审判工作会议纪要》（九民纪要）及相关司法解释",
-            "factors": {
-                "loss": {
-                    "name": "实际损失",
-                    "description": "违约行为造成的直接损失和可得利益损失",
-                    "weight": "基础基准"
-                },
-                "performance": {
-                    "name": "合同履行情况",
-                    "description": "已履行部分占合同总义务的比例",
-                    "impact": "负相关 (履行越多，违约金调整幅度越大)"
-                },
-                "fault": {
-                    "name": "当事人过错程度",
-                    "description": "违约方的主观恶意程度 (故意、重大过失、轻微过失)",
-                    "impact": "正相关 (过错越大，违约金可能越高)"
-                }
-            },
-            "formula_reference": "V_final = f(Loss, Performance, Fault)",
-            "guidelines": [
-                "以实际损失为基础，兼顾合同的履行情况、当事人的过错程度以及预期利益等综合因素",
-                "约定的违约金超过造成损失的百分之三十的，一般可以认定为过分高于造成的损失"
-            ]
-        }
+        return _dumps_pretty(jsonld)
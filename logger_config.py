@@ -1,13 +1,24 @@
 import logging
+import logging.handlers
+import atexit
+import contextvars
+import copy
+import queue
 import json
 import time
-import uuid
+import random
 import os
-from typing import Optional
+from typing import Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    # orjson 为可选依赖，未安装时使用标准库 json
+    orjson = None
 
 class JSONFormatter(logging.Formatter):
     """
-    简易的 JSON 日志格式化器，不依赖外部库
+    简易的 JSON 日志格式化器，安装 orjson 时使用其 C 实现编码
     """
     def format(self, record):
         log_record = {
@@ -21,15 +32,71 @@ class JSONFormatter(logging.Formatter):
         }
         
         # 合并 extra 字段
-        if hasattr(record, "trace_id"):
-            log_record["trace_id"] = record.trace_id
+        record_dict = record.__dict__
+        if "trace_id" in record_dict:
+            log_record["trace_id"] = record_dict["trace_id"]
             
-        # 处理异常信息
+        # 处理异常信息 (经队列转发的记录已在生产者线程中预先格式化为 exc_text)
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record["exception"] = record.exc_text
             
+        if orjson is not None:
+            return orjson.dumps(log_record).decode("utf-8")
         return json.dumps(log_record, ensure_ascii=False)
 
+_exception_formatter = logging.Formatter()
+
+# 当前请求的追踪 ID，由 bind_trace_id 在请求入口绑定 (asyncio 任务与 to_thread 工作线程会继承)；
+# 未通过 extra 显式传入 trace_id 的日志记录在入队时自动带上它，调用方无需每次构造 extra 字典
+_trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+def bind_trace_id(trace_id: str) -> contextvars.Token:
+    """把追踪 ID 绑定到当前上下文，返回供 reset_trace_id 使用的令牌"""
+    return _trace_id_var.set(trace_id)
+
+
+def reset_trace_id(token: contextvars.Token):
+    """恢复 bind_trace_id 之前的追踪 ID"""
+    _trace_id_var.reset(token)
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    只入队日志记录，JSON 编码与 I/O 交给后台 QueueListener 线程完成。
+    标准 QueueHandler.prepare 会把异常堆栈拼进 message，这里改为单独保存在 exc_text 中。
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        # prepare 在产生日志的线程中执行，此时仍能读到该请求绑定的追踪 ID
+        if "trace_id" not in record.__dict__:
+            trace_id = _trace_id_var.get()
+            if trace_id is not None:
+                record.trace_id = trace_id
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# 每个 logger 名称对应一个后台监听线程，重复调用 setup_logger 时替换旧线程
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+
+
+def _stop_listeners():
+    """进程退出时停止所有监听线程，确保队列中剩余的日志被写出"""
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+
+
+atexit.register(_stop_listeners)
+
+
 def setup_logger(name: str = "LegalCNServer", level: int = logging.INFO) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -38,11 +105,24 @@ def setup_logger(name: str = "LegalCNServer", level: int = logging.INFO) -> logg
     if logger.hasHandlers():
         logger.handlers.clear()
         
+    previous = _listeners.pop(name, None)
+    if previous is not None:
+        previous.stop()
+
     handler = logging.StreamHandler()
     handler.setFormatter(JSONFormatter())
-    logger.addHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    _listeners[name] = listener
+    logger.addHandler(_RecordQueueHandler(log_queue))
     
     return logger
 
 def get_trace_id() -> str:
-    return str(uuid.uuid4())
+    # 追踪 ID 无需密码学强度：使用全局 Mersenne Twister (fork 后自动重新播种)，
+    # 避免 uuid4 的 os.urandom 系统调用与 UUID 对象构造；按 UUID 的位置插入连字符，
+    # 避免长数字串被响应脱敏误判为手机号、身份证或账号
+    h = f"{random.getrandbits(128):032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
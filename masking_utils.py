@@ -0,0 +1,56 @@
+"""
+privacy_middleware 与 privacy_logic 共用的脱敏辅助函数。
+两个模块各自维护脱敏规则 (正则与邮箱本地部分字符集)，这里只放与具体规则无关的扫描逻辑。
+"""
+
+import re
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+# 与脱敏规则中的 \d 语义一致 (含全角等 Unicode 数字)
+DIGIT_SEARCH = re.compile(r"\d").search
+
+
+def iter_strings(obj: Any) -> Iterator[str]:
+    """递归遍历参数结构，依次产出其中的字符串 (包括字典的键)"""
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(key, str):
+                yield key
+            yield from iter_strings(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            yield from iter_strings(item)
+
+
+def combine_patterns(patterns: Mapping[str, re.Pattern], kinds: Iterable[str]) -> re.Pattern:
+    """把若干规则合并为一个命名分组的交替正则，规则顺序即同一位置上的匹配优先级"""
+    return re.compile("|".join(f"(?P<{kind}>{patterns[kind].pattern})" for kind in kinds))
+
+
+def sub_with_email(regex: re.Pattern, text: str, repl: Callable[[re.Match], str],
+                   mask_email: Callable[[str], str], local_chars: frozenset) -> str:
+    """
+    与 regex.sub(repl, text) 相同，但邮箱命中交给 mask_email，并先向左扩展到连续本地部分字符的起点：
+    邮箱规则的本地部分限长 64 以保证线性扫描，更长的本地部分会从连续段中间开始匹配，
+    扩展后整段一起脱敏，不会把前面的字符原样留在结果中。没有命中时返回原字符串
+    """
+    parts = []
+    last = 0
+    for match in regex.finditer(text):
+        start, end = match.span()
+        if match.lastgroup == "email":
+            # 只扩展到上一个命中的末尾，每个字符最多回看一次，整体仍为线性
+            while start > last and text[start - 1] in local_chars:
+                start -= 1
+            masked = mask_email(text[start:end])
+        else:
+            masked = repl(match)
+        parts.append(text[last:start])
+        parts.append(masked)
+        last = end
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
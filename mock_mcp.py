@@ -2,47 +2,47 @@ from typing import Any, List, Optional, Dict
 from dataclasses import dataclass
 
 # Mock MCP types
-@dataclass
+@dataclass(slots=True)
 class Tool:
     name: str
     description: str
     inputSchema: Dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class TextContent:
     type: str
     text: str
 
-@dataclass
+@dataclass(slots=True)
 class ImageContent:
     type: str
     data: str
     mimeType: str
 
-@dataclass
+@dataclass(slots=True)
 class EmbeddedResource:
     type: str
     resource: Any
 
-@dataclass
+@dataclass(slots=True)
 class Resource:
     uri: str
     name: str
     description: str
     mimeType: str
 
-@dataclass
+@dataclass(slots=True)
 class Prompt:
     name: str
     description: str
     arguments: List[Dict[str, Any]]
 
-@dataclass
+@dataclass(slots=True)
 class PromptMessage:
     role: str
     content: Any
 
-@dataclass
+@dataclass(slots=True)
 class GetPromptResult:
     description: str
     messages: List[PromptMessage]
@@ -3,9 +3,73 @@ Privacy and Security Logic for MCP-Legal-China
 """
 
 import re
-import json
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 
+from masking_utils import DIGIT_SEARCH, combine_patterns, iter_strings, sub_with_email
+
+
+def _mask_id(s: str) -> str:
+    # 身份证号脱敏: 保留前6后4
+    return s[:6] + "*" * 8 + s[-4:]
+
+
+def _mask_phone(s: str) -> str:
+    # 手机号脱敏: 保留前3后4
+    return s[:3] + "****" + s[-4:]
+
+
+def _mask_email(s: str) -> str:
+    # 邮箱脱敏: 只保留 @ 后面的
+    try:
+        name, domain = s.split('@')
+        return name[0] + "***" + "@" + domain
+    except ValueError:
+        return s
+
+
+def _has_str(obj: Any, _depth: int = 0) -> bool:
+    """粗略判断数据中是否可能含有字符串；超过深度上限时保守地返回 True"""
+    if isinstance(obj, str):
+        return True
+    if _depth > 4:
+        return True
+    if isinstance(obj, dict):
+        return any(_has_str(v, _depth + 1) for v in obj.values())
+    if isinstance(obj, list):
+        return any(_has_str(x, _depth + 1) for x in obj)
+    return False
+
+
+# mask_data 缓存的短字符串长度上限与缓存容量；长文本很少重复，直接计算
+_MASK_CACHE_MAX_LEN = 64
+_MASK_CACHE_SIZE = 4096
+
+_MASK_HANDLERS = {
+    "id_card": _mask_id,
+    "phone": _mask_phone,
+    "email": _mask_email,
+}
+
+# 脱敏正则在模块加载时预编译一次，所有实例共用
+_PATTERNS = {
+    "id_card": re.compile(r"\d{17}[\dXx]"),
+    "phone": re.compile(r"1[3-9]\d{9}"),
+    # 邮箱本地部分按 RFC 5321 限长 64，避免长文本上逐个起点回溯造成的平方级扫描 (更长的本地部分由 sub_with_email 整段脱敏)
+    "email": re.compile(r"[a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"),
+    "name": re.compile(r"(?<=姓名[:：\s])[\u4e00-\u9fa5]{2,4}") # 简单的上下文匹配
+}
+
+
+# 身份证、手机号、邮箱合并为一个正则，按原先的替换顺序决定同一位置的优先级
+_COMBINED_RE = combine_patterns(_PATTERNS, _MASK_HANDLERS)
+# 不含邮箱规则的合并正则，用于文本中没有 '@' 的情况
+_DIGITS_RE = combine_patterns(_PATTERNS, (kind for kind in _MASK_HANDLERS if kind != "email"))
+_EMAIL_ONLY_RE = combine_patterns(_PATTERNS, ("email",))
+# 邮箱规则本地部分的字符集，与本模块的 _PATTERNS["email"] 保持一致 (含 '%'，与 privacy_middleware 的规则不同)
+_EMAIL_LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-")
+
+
 class PrivacyPreservingMAE:
     """
     Privacy Preserving Multi-Agent Execution Layer
@@ -14,56 +78,79 @@ class PrivacyPreservingMAE:
     """
 
     def __init__(self):
-        # 简单的正则匹配模式，用于演示脱敏
-        self.patterns = {
-            "id_card": r"\d{17}[\dXx]",
-            "phone": r"1[3-9]\d{9}",
-            "email": r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}",
-            "name": r"(?<=姓名[:：\s])[\u4e00-\u9fa5]{2,4}" # 简单的上下文匹配
-        }
+        # 简单的正则匹配模式，用于演示脱敏 (引用模块级预编译的正则，构造实例时不再重新编译)
+        self.patterns = _PATTERNS
+        self._combined_re = _COMBINED_RE
+        self._digits_re = _DIGITS_RE
+        self._email_only_re = _EMAIL_ONLY_RE
+        # 字段标签、枚举值等短字符串在结果中大量重复，按内容缓存脱敏结果 (每个实例独立，容量有上限)
+        self._mask_cached = lru_cache(maxsize=_MASK_CACHE_SIZE)(self._mask_or_none)
 
     def mask_data(self, data: Any) -> Any:
         """
-        递归地对数据进行脱敏处理
+        对数据进行脱敏处理 (迭代遍历嵌套的 dict/list)
+        仅复制包含被脱敏字符串的容器，未改动的子树原样返回，不修改传入的数据
         """
         if isinstance(data, str):
             return self._mask_string(data)
-        elif isinstance(data, list):
-            return [self.mask_data(item) for item in data]
-        elif isinstance(data, dict):
-            return {k: self.mask_data(v) for k, v in data.items()}
-        else:
+        if not isinstance(data, (dict, list)) or not _has_str(data):
+            # 纯数值等不含字符串的结构无需遍历
             return data
 
+        # 栈帧: [容器, (键, 值) 迭代器, 正在遍历的子容器所在的键, 写时复制的副本]
+        # 直接迭代 items()/enumerate()，未改动的子树不产生键列表等额外分配
+        stack = [[data, iter(data.items()) if isinstance(data, dict) else enumerate(data), None, None]]
+        while True:
+            frame = stack[-1]
+            for key, child in frame[1]:
+                if isinstance(child, str):
+                    if len(child) <= _MASK_CACHE_MAX_LEN:
+                        masked = self._mask_cached(child)
+                        if masked is None:
+                            continue
+                    else:
+                        masked = self._mask_string(child)
+                        if masked is child:
+                            continue
+                    if frame[3] is None:
+                        frame[3] = frame[0].copy()
+                    frame[3][key] = masked
+                elif isinstance(child, (dict, list)):
+                    frame[2] = key
+                    stack.append([child, iter(child.items()) if isinstance(child, dict) else enumerate(child), None, None])
+                    break
+            else:
+                stack.pop()
+                node, _, _, copy = frame
+                done = node if copy is None else copy
+                if not stack:
+                    return done
+                if done is not node:
+                    parent = stack[-1]
+                    if parent[3] is None:
+                        parent[3] = parent[0].copy()
+                    parent[3][parent[2]] = done
+
+    def _mask_or_none(self, text: str) -> Optional[str]:
+        """脱敏结果与原文相同时返回 None，缓存命中时调用方可继续使用自己手中的原字符串"""
+        masked = self._mask_string(text)
+        return None if masked is text else masked
+
     def _mask_string(self, text: str) -> str:
         """
         对字符串进行正则匹配和脱敏
         """
-        masked_text = text
-        
-        # 身份证号脱敏: 保留前6后4
-        def mask_id(match):
-            s = match.group()
-            return s[:6] + "*" * 8 + s[-4:]
-        masked_text = re.sub(self.patterns["id_card"], mask_id, masked_text)
-
-        # 手机号脱敏: 保留前3后4
-        def mask_phone(match):
-            s = match.group()
-            return s[:3] + "****" + s[-4:]
-        masked_text = re.sub(self.patterns["phone"], mask_phone, masked_text)
-
-        # 邮箱脱敏: 只保留 @ 后面的
-        def mask_email(match):
-            s = match.group()
-            try:
-                name, domain = s.split('@')
-                return name[0] + "***" + "@" + domain
-            except ValueError:
-                return s
-        masked_text = re.sub(self.patterns["email"], mask_email, masked_text)
-
-        return masked_text
+        # 预检查：数字类规则需要文本含数字，邮箱规则需要含 '@'，都不满足时无需进入正则引擎
+        has_digit = DIGIT_SEARCH(text) is not None
+        if "@" not in text:
+            return self._digits_re.sub(self._mask_match, text) if has_digit else text
+        regex = self._combined_re if has_digit else self._email_only_re
+        return sub_with_email(regex, text, self._mask_match, _mask_email, _EMAIL_LOCAL_CHARS)
+
+    def _mask_match(self, match: re.Match) -> str:
+        """按命中的规则名分派到对应的脱敏函数"""
+        kind = match.lastgroup
+        return _MASK_HANDLERS[kind](match.group(kind))
 
 
 class Elicitation:
@@ -79,17 +166,29 @@ class Elicitation:
             "漏洞利用", "攻击", "渗透", "social engineering",
             "绕过", "bypass"
         ]
+        # 全部关键词编译为一个交替正则，一次扫描找出所有命中 (关键词之间互不包含，不会漏检)
+        self._keyword_re = re.compile("|".join(map(re.escape, self.sensitive_keywords)))
 
     def check_input(self, arguments: Dict[str, Any]) -> List[str]:
         """
         检查输入参数是否包含敏感内容
         返回检测到的风险列表
         """
-        risks = []
-        input_str = json.dumps(arguments, ensure_ascii=False)
-        
-        for keyword in self.sensitive_keywords:
-            if keyword in input_str:
-                risks.append(f"检测到敏感关键词: {keyword}")
-        
-        return risks
+        # 逐个扫描键名与字符串值，无需先把整个参数结构序列化为 JSON
+        found = set()
+        for text in iter_strings(arguments):
+            found.update(self._keyword_re.findall(text))
+        if not found:
+            return []
+
+        # 按关键词列表顺序输出，每个关键词只报告一次
+        return [f"检测到敏感关键词: {keyword}" for keyword in self.sensitive_keywords if keyword in found]
+
+
+@lru_cache(maxsize=1)
+def get_mae() -> PrivacyPreservingMAE:
+    """
+    进程内共享的数据脱敏实例 (privacy_logic 版本，供 mask_data 使用)。
+    实例自带按内容缓存的 mask_data 结果，共用一个实例可让缓存在各调用方之间复用
+    """
+    return PrivacyPreservingMAE()
@@ -1,7 +1,238 @@
 import re
 import time
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+
+from masking_utils import DIGIT_SEARCH, combine_patterns, iter_strings, sub_with_email
+
+try:
+    import numpy as np
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    # NumPy / Numba 为可选依赖，未安装时 mask_bulk 回退到 mask_batch 的正则路径，
+    # 字节内核仍可定义但不会被调用 (纯 Python 逐字节运行远慢于正则)
+    np = None
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+    _HAS_NUMBA = False
+
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick 为可选依赖，未安装时敏感字段检查使用编译正则
+    ahocorasick = None
+
+
+def _mask_email(val: str) -> str:
+    # 邮箱脱敏: a***@example.com
+    return val[0] + "***" + val[val.find('@'):]
+
+
+# 合规元数据中除时间戳外的固定字段
+_BASE_COMPLIANCE_META = {
+    "model_version": "Legal-CN-v0.2.0",
+    "watermark": "AI Generated Content - PIPL Compliant",
+    "processor": "PrivacyPreservingMAE"
+}
+
+# 合规元数据块缓存 (生成时间, 元数据字典)，秒级精度足够，1 秒内的所有响应共用同一个字典 (只读，调用方不应修改)
+_COMPLIANCE_TS_TTL = 1.0
+_compliance_cache = [(0.0, {})]
+
+
+def _compliance_block() -> Dict[str, str]:
+    now = time.time()
+    cached_at, block = _compliance_cache[0]
+    if now - cached_at >= _COMPLIANCE_TS_TTL:
+        timestamp = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+        block = {"timestamp": timestamp, **_BASE_COMPLIANCE_META}
+        # 生成时间与字典作为一个元组整体替换，并发读取时不会拿到不配对的时间戳
+        _compliance_cache[0] = (now, block)
+    return block
+
+
+def _mask_match(match: re.Match) -> str:
+    """
+    re.sub 回调: 手机号、身份证、账号的脱敏结果为固定版式，直接在此切片拼接，
+    每个命中只进入一次 Python 函数；邮箱交给 _mask_email
+    """
+    kind = match.lastgroup
+    val = match.group()
+    if kind == "phone":
+        # 手机号脱敏: 138****1234
+        return val[:3] + "****" + val[-4:]
+    if kind == "id_card":
+        # 身份证脱敏: 18 位保留前 6 后 4，15 位保留前 6 后 3
+        if len(val) == 15:
+            return val[:6] + "******" + val[-3:]
+        return val[:6] + "********" + val[-4:]
+    if kind == "account":
+        # 账号脱敏: **** 1234
+        return "**** " + val[-4:]
+    return _mask_email(val)
+
+
+# ==================== 批量数字脱敏内核 ====================
+# 对 ASCII 数字串逐字节处理，规则与 patterns 中的手机号 / 身份证 / 账号保持一致:
+# 数字串 (前后均非数字) 长 11 且形如 1[3-9]… 为手机号，长 15 或 18 且首位非 0 为身份证，
+# 17 位数字后接 X/x (且 X 后不是数字) 也是身份证；其余长 16-19 的数字串为账号。
+
+@njit(cache=True)
+def _is_digit(c):
+    return 48 <= c <= 57
+
+
+@njit(cache=True)
+def _mask_digits_one(buf, out, start, end):
+    """脱敏 buf[start:end]，写入 out[start:…]，返回写入长度 (脱敏结果不会比原文更长)"""
+    w = start
+    j = start
+    while j < end:
+        c = buf[j]
+        if not _is_digit(c):
+            out[w] = c
+            w += 1
+            j += 1
+            continue
+        k = j
+        while k < end and _is_digit(buf[k]):
+            k += 1
+        n = k - j
+        if n == 11 and c == 49 and 51 <= buf[j + 1] <= 57:
+            # 手机号: 前 3 后 4
+            for t in range(3):
+                out[w + t] = buf[j + t]
+            for t in range(4):
+                out[w + 3 + t] = 42
+                out[w + 7 + t] = buf[k - 4 + t]
+            w += 11
+            j = k
+        elif (n == 17 and c != 48 and k < end and (buf[k] == 88 or buf[k] == 120)
+              and (k + 1 == end or not _is_digit(buf[k + 1]))):
+            # 17 位数字 + X 的身份证: 前 6 后 4 (含 X)
+            for t in range(6):
+                out[w + t] = buf[j + t]
+            for t in range(8):
+                out[w + 6 + t] = 42
+            for t in range(4):
+                out[w + 14 + t] = buf[k - 3 + t]
+            w += 18
+            j = k + 1
+        elif (n == 15 or n == 18) and c != 48:
+            # 身份证: 18 位保留前 6 后 4，15 位保留前 6 后 3
+            tail = 4 if n == 18 else 3
+            for t in range(6):
+                out[w + t] = buf[j + t]
+            for t in range(n - 6 - tail):
+                out[w + 6 + t] = 42
+            for t in range(tail):
+                out[w + n - tail + t] = buf[k - tail + t]
+            w += n
+            j = k
+        elif 16 <= n <= 19:
+            # 账号: 输出 "**** " + 末 4 位
+            for t in range(4):
+                out[w + t] = 42
+            out[w + 4] = 32
+            for t in range(4):
+                out[w + 5 + t] = buf[k - 4 + t]
+            w += 9
+            j = k
+        else:
+            # 其余数字串 (含超过 19 位的长数字串) 原样保留
+            while j < k:
+                out[w] = buf[j]
+                w += 1
+                j += 1
+    return w - start
+
+
+# 不使用 parallel=True：Numba 默认的 workqueue 线程层在多个线程同时调用并行内核时会直接终止进程，
+# 而 get_mae() 返回的共享实例可能被 to_thread 工作线程并发调用
+@njit(cache=True)
+def _mask_segments(buf, offsets, out, out_len):
+    for i in range(len(offsets) - 1):
+        out_len[i] = _mask_digits_one(buf, out, offsets[i], offsets[i + 1])
+
+
+@njit(cache=True)
+def _mask_digits_bulk(buf, offsets, out, out_len):
+    """逐段脱敏后把结果前移压实，返回有效长度"""
+    _mask_segments(buf, offsets, out, out_len)
+    w = 0
+    for i in range(len(out_len)):
+        start = offsets[i]
+        for t in range(out_len[i]):
+            out[w + t] = out[start + t]
+        w += out_len[i]
+    return w
+
+
+def _mask_digits_compiled(text: str) -> str:
+    """
+    用字节内核对不含邮箱、仅含 ASCII 数字的文本做数字类脱敏。
+    文本在每个 NUL 之后切段，各段 (含其后的 NUL) 由内核依次处理；仅在 _HAS_NUMBA 时调用
+    """
+    buf = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    offsets = np.concatenate(([0], np.flatnonzero(buf == 0) + 1, [len(buf)])).astype(np.int64)
+    out = np.empty_like(buf)
+    out_len = np.empty(len(offsets) - 1, dtype=np.int64)
+    total = _mask_digits_bulk(buf, offsets, out, out_len)
+    # 没有任何命中时直接返回原字符串，省去解码并与 re.sub 无命中时的行为一致
+    if total == len(buf) and np.array_equal(out, buf):
+        return text
+    return out[:total].tobytes().decode("utf-8")
+
+
+if _HAS_NUMBA:
+    # 模块加载时预热编译，避免首次调用在事件循环线程上承担 JIT 开销
+    _mask_digits_compiled("13812345678\x00")
+
+
+# 非 ASCII 的 Unicode 数字 (如全角数字) 也会被 \d 匹配，这类字符串交给正则路径处理
+_NON_ASCII_DIGIT_SEARCH = re.compile(r"(?![0-9])\d").search
+
+# 邮箱规则本地部分 (@ 之前) 的字符集，与 patterns["email"] 保持一致
+_EMAIL_LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.+-")
+
+# mask_result 不脱敏的字段：PID 与追踪 ID 由服务端生成，不含个人信息，不应被数字类规则改写
+_UNMASKED_KEYS = frozenset({"report_pid", "parent_pid", "contract_pid", "source_pid", "causal_trace_id", "trace_id"})
+
+# 数字类规则最短命中 11 位 (手机号)，绝对值更小的整数无需转为文本扫描
+_MIN_MASKED_INT = 10 ** 10
+
+# mask_batch 使用的拼接分隔符
+_BATCH_SEP = "\x00"
+
+# 合并扫描的规则顺序即同一位置上的匹配优先级 (与原先逐条替换的先后顺序一致)
+_MASK_KINDS = ("phone", "id_card", "account", "email")
+
+
+# 敏感信息正则匹配规则，模块加载时预编译一次，所有实例共用
+_PATTERNS = {k: re.compile(v) for k, v in {
+    # 简单姓名匹配 (2-4个汉字) - 仅作为示例，实际需结合语义分析更准确
+    "name": r"(?<![\u4e00-\u9fa5])([\u4e00-\u9fa5]{1})[\u4e00-\u9fa5]{1,2}(?![\u4e00-\u9fa5])",
+    # 手机号 (11位数字)
+    "phone": r"(?<!\d)(1[3-9]\d{9})(?!\d)",
+    # 身份证 (15或18位)
+    "id_card": r"(?<!\d)([1-9]\d{14}|[1-9]\d{16}[\dXx])(?!\d)",
+    # 银行卡/账号 (16-19位数字)，前后不能紧邻数字，避免命中更长数字串的一部分
+    "account": r"(?<!\d)(\d{16,19})(?!\d)",
+    # 邮箱 (本地部分按 RFC 5321 限长 64，匹配失败时每个起点最多回溯 64 个字符，长文本扫描保持线性；
+    # 更长的本地部分由 sub_with_email 向左扩展后整段脱敏)
+    "email": r"([a-zA-Z0-9_.+-]{1,64}@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)"
+}.items()}
+
+
+_COMBINED_RE = combine_patterns(_PATTERNS, _MASK_KINDS)
+# 不含邮箱规则的合并正则，用于文本中没有 '@' 的情况
+_DIGITS_RE = combine_patterns(_PATTERNS, (kind for kind in _MASK_KINDS if kind != "email"))
+_EMAIL_ONLY_RE = combine_patterns(_PATTERNS, ("email",))
+
 
 class PrivacyPreservingMAE:
     """
@@ -10,19 +241,11 @@ class PrivacyPreservingMAE:
     """
 
     def __init__(self):
-        # 初始化敏感信息正则匹配规则
-        self.patterns = {
-            # 简单姓名匹配 (2-4个汉字) - 仅作为示例，实际需结合语义分析更准确
-            "name": r"(?<![\u4e00-\u9fa5])([\u4e00-\u9fa5]{1})[\u4e00-\u9fa5]{1,2}(?![\u4e00-\u9fa5])", 
-            # 手机号 (11位数字)
-            "phone": r"(?<!\d)(1[3-9]\d{9})(?!\d)",
-            # 身份证 (15或18位)
-            "id_card": r"(?<!\d)([1-9]\d{14}|[1-9]\d{16}[\dXx])(?!\d)",
-            # 银行卡/账号 (16-19位数字)
-            "account": r"(\d{16,19})",
-            # 邮箱
-            "email": r"([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)"
-        }
+        # 敏感信息正则匹配规则 (引用模块级预编译的正则，构造实例时不再重新编译)
+        self.patterns = _PATTERNS
+        self._combined_re = _COMBINED_RE
+        self._digits_re = _DIGITS_RE
+        self._email_only_re = _EMAIL_ONLY_RE
         
         # 敏感字段关键词，用于 Elicitation
         self.sensitive_fields = [
@@ -32,6 +255,16 @@ class PrivacyPreservingMAE:
             "fingerprint", "指纹",
             "genetic", "基因"
         ]
+        # 全部敏感字段编译为一个交替正则，一次扫描找出所有命中 (关键词之间互不包含，不会漏检)
+        self._sensitive_field_re = re.compile("|".join(map(re.escape, self.sensitive_fields)))
+        # 安装了 pyahocorasick 时改用 Aho-Corasick 自动机扫描，值为关键词在列表中的序号
+        if ahocorasick is not None:
+            self._fields_ac = ahocorasick.Automaton()
+            for idx, keyword in enumerate(self.sensitive_fields):
+                self._fields_ac.add_word(keyword.lower(), idx)
+            self._fields_ac.make_automaton()
+        else:
+            self._fields_ac = None
 
     def mask_sensitive_data(self, text: str) -> str:
         """
@@ -40,34 +273,111 @@ class PrivacyPreservingMAE:
         if not isinstance(text, str):
             return text
 
-        # 手机号脱敏: 138****1234
-        # Note: pattern "phone" now has lookaround (?<!\d)(1[3-9]\d{9})(?!\d)
-        # So group(1) captures the phone number itself.
-        text = re.sub(self.patterns["phone"], lambda m: m.group(1)[:3] + "****" + m.group(1)[-4:], text)
-        
-        # 身份证脱敏
-        def mask_id(match):
-            val = match.group(1)
-            if len(val) == 18:
-                return val[:6] + "********" + val[-4:]
-            elif len(val) == 15:
-                return val[:6] + "******" + val[-3:]
-            # 兼容其他长度（如17位+X）的意外匹配，虽然正则已约束
-            return val[:6] + "********" + val[-4:]
-
-        text = re.sub(self.patterns["id_card"], mask_id, text)
-        
-        # 账号脱敏: **** 1234
-        text = re.sub(self.patterns["account"], lambda m: "**** " + m.group(1)[-4:], text)
-        
-        # 邮箱脱敏: a***@example.com
-        text = re.sub(self.patterns["email"], lambda m: m.group(1)[0] + "***" + m.group(1)[m.group(1).find('@'):], text)
-        
+        # 手机号、身份证、账号、邮箱合并为一个正则，一次扫描完成全部脱敏
         # 姓名脱敏 (简单处理，保留姓): 张*
-        # 注意：这里仅对看起来像名字的独立词汇处理，避免误伤
-        # text = re.sub(self.patterns["name"], lambda m: m.group(1) + "*" * (len(m.group(0)) - 1), text)
-        
-        return text
+        # 注意：姓名规则误伤较多，暂不参与合并扫描
+        # text = self.patterns["name"].sub(lambda m: m.group(1) + "*" * (len(m.group(0)) - 1), text)
+        # 预检查：数字类规则需要文本含数字，邮箱规则需要含 '@'，都不满足时无需进入正则引擎
+        # '@' 用 str.find (memchr) 定位，第一个邮箱候选之前的部分不可能命中邮箱规则
+        at = text.find("@")
+        has_digit = DIGIT_SEARCH(text) is not None
+        if at == -1:
+            if not has_digit:
+                return text
+            # 单条文本始终走正则路径 (标准库正则，事件循环线程上不触发 JIT 编译，也不依赖 NumPy/Numba)；
+            # 字节内核只用于显式调用的 mask_bulk，服务端响应脱敏不经过它
+            return self._digits_re.sub(_mask_match, text)
+        if not has_digit:
+            return sub_with_email(self._email_only_re, text, _mask_match, _mask_email, _EMAIL_LOCAL_CHARS)
+
+        # 从 '@' 向左回溯到邮箱本地部分的起点，起点之前只需运行数字类规则。
+        # 起点左侧紧邻的字符不属于本地部分字符集；若它是 Unicode 数字则可能与右侧数字相连，此时不拆分
+        start = at
+        while start > 0 and text[start - 1] in _EMAIL_LOCAL_CHARS:
+            start -= 1
+        if start == 0 or text[start - 1].isdecimal():
+            return sub_with_email(self._combined_re, text, _mask_match, _mask_email, _EMAIL_LOCAL_CHARS)
+        head, n_head = self._digits_re.subn(_mask_match, text[:start])
+        rest = text[start:]
+        tail = sub_with_email(self._combined_re, rest, _mask_match, _mask_email, _EMAIL_LOCAL_CHARS)
+        # 两段都没有命中时返回原字符串，不再重新拼接
+        return head + tail if n_head or tail is not rest else text
+
+    def mask_result(self, data: Any) -> Any:
+        """
+        在序列化之前对结果结构逐个字符串值脱敏：浮点数、布尔值与 None 不参与正则扫描，
+        整数按十进制文本脱敏 (命中时替换为脱敏后的字符串，与序列化后整段扫描的结果一致)。
+        字典键由服务端代码给出，不做脱敏；_UNMASKED_KEYS 中的 PID、追踪 ID 字段原样保留。
+        仅复制包含被脱敏值的容器 (元组按列表处理)，未改动的子树原样返回，不修改传入的数据
+        """
+        if isinstance(data, str):
+            return self.mask_sensitive_data(data)
+        if isinstance(data, int):
+            if -_MIN_MASKED_INT < data < _MIN_MASKED_INT:
+                return data
+            text = str(data)
+            masked = self.mask_sensitive_data(text)
+            return data if masked is text else masked
+        if isinstance(data, dict):
+            masked = None
+            for key, value in data.items():
+                if isinstance(value, (str, int, dict, list, tuple)) and key not in _UNMASKED_KEYS:
+                    new_value = self.mask_result(value)
+                    if new_value is not value:
+                        if masked is None:
+                            masked = dict(data)
+                        masked[key] = new_value
+            return data if masked is None else masked
+        if isinstance(data, (list, tuple)):
+            masked = None
+            for index, item in enumerate(data):
+                if isinstance(item, (str, int, dict, list, tuple)):
+                    new_item = self.mask_result(item)
+                    if new_item is not item:
+                        if masked is None:
+                            masked = list(data)
+                        masked[index] = new_item
+            return data if masked is None else masked
+        return data
+
+    def mask_batch(self, texts: List[Any]) -> List[Any]:
+        """
+        批量脱敏：以 NUL 拼接全部字符串，只做一次预检查和一次正则扫描，避免逐条调用的开销。
+        NUL 不属于任何脱敏规则的字符集，匹配不会跨越拼接边界。
+        """
+        if not texts:
+            return []
+        if any(not isinstance(text, str) or _BATCH_SEP in text for text in texts):
+            return [self.mask_sensitive_data(text) for text in texts]
+        return self.mask_sensitive_data(_BATCH_SEP.join(texts)).split(_BATCH_SEP)
+
+    def mask_bulk(self, texts: Any) -> List[Any]:
+        """
+        大批量脱敏：不含邮箱的字符串以 NUL 拼接为一个 uint8 缓冲区，由 Numba 内核逐字节脱敏；
+        其余元素 (含 '@'、NUL、非 ASCII 数字或非字符串) 回退到 mask_sensitive_data。
+        未安装 Numba 时整批交给 mask_batch。结果与逐条调用 mask_sensitive_data 一致。
+        """
+        texts = list(texts)
+        if not _HAS_NUMBA:
+            return self.mask_batch(texts)
+        results: List[Any] = [None] * len(texts)
+        bulk_index: List[int] = []
+        bulk_texts: List[str] = []
+        for i, text in enumerate(texts):
+            if (isinstance(text, str) and "@" not in text and _BATCH_SEP not in text
+                    and _NON_ASCII_DIGIT_SEARCH(text) is None):
+                bulk_index.append(i)
+                bulk_texts.append(text)
+            else:
+                results[i] = self.mask_sensitive_data(text)
+        if not bulk_texts:
+            return results
+
+        # NUL 不是数字，脱敏内核原样复制，天然隔开各条字符串
+        masked = _mask_digits_compiled(_BATCH_SEP.join(bulk_texts)).split(_BATCH_SEP)
+        for i, text in zip(bulk_index, masked):
+            results[i] = text
+        return results
 
     def check_elicitation_requirement(self, arguments: Dict[str, Any]) -> Optional[str]:
         """
@@ -75,9 +385,25 @@ class PrivacyPreservingMAE:
         当检测到输入包含敏感字段时返回提示信息，否则返回 None
         """
         # 检查参数名或参数值中是否包含敏感关键词
-        raw_args = str(arguments).lower()
+        # 逐个扫描键名与字符串值，无需先把整个参数结构转成字符串
+        found = set()
+        if self._fields_ac is not None:
+            for text in iter_strings(arguments):
+                found.update(idx for _, idx in self._fields_ac.iter(text.lower()))
+            if not found:
+                return None
+            # 多个命中时按关键词列表顺序报告第一个，与逐个检查时的结果一致
+            keyword = self.sensitive_fields[min(found)]
+            return f"检测到敏感信息字段 '{keyword}'，需获取用户显式确认 (mcp_elicitation_request)"
+
+        for text in iter_strings(arguments):
+            found.update(self._sensitive_field_re.findall(text.lower()))
+        if not found:
+            return None
+
+        # 多个命中时按关键词列表顺序报告第一个，与逐个检查时的结果一致
         for keyword in self.sensitive_fields:
-            if keyword in raw_args:
+            if keyword in found:
                 return f"检测到敏感信息字段 '{keyword}'，需获取用户显式确认 (mcp_elicitation_request)"
         return None
 
@@ -85,20 +411,19 @@ class PrivacyPreservingMAE:
         """
         元数据注入：添加 gb_45438_compliance 字段
         """
-        metadata = {
-            "gb_45438_compliance": {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "model_version": "Legal-CN-v0.2.0",
-                "watermark": "AI Generated Content - PIPL Compliant",
-                "processor": "PrivacyPreservingMAE"
-            }
-        }
-        
         # 如果 result 已经是字典，直接合并；如果是 TextContent 对象列表，通常在 server 层处理
         # 这里假设处理的是结果字典
         if isinstance(result, dict):
-            if "metadata" not in result:
-                result["metadata"] = {}
-            result["metadata"].update(metadata)
+            # 同一秒内的响应直接引用缓存的元数据块，不再逐次构造字典
+            result.setdefault("metadata", {})["gb_45438_compliance"] = _compliance_block()
         
         return result
+
+
+@lru_cache(maxsize=1)
+def get_mae() -> PrivacyPreservingMAE:
+    """
+    进程内共享的 PrivacyPreservingMAE 实例，脱敏规则与正则只编译一次。
+    实例初始化后只读，可在多个线程与 asyncio 任务间共用；需要自定义规则时请自行构造新实例
+    """
+    return PrivacyPreservingMAE()
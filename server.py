@@ -9,11 +9,26 @@ MCP-Legal-China Server
 """
 
 import os
+import sys
 import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    # orjson 为可选依赖，未安装时使用标准库 json 序列化工具结果
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    # uvloop 为可选依赖，未安装时 (含 Windows) 使用 asyncio 默认事件循环
+    uvloop = None
+
 try:
     from mcp.server import Server
     from mcp.server.stdio import stdio_server
@@ -42,14 +57,14 @@ except ImportError:
         GetPromptResult,
     )
 
-from privacy_middleware import PrivacyPreservingMAE
+from privacy_middleware import get_mae
 
 # 引入自定义模块
-from errors import AppError, ErrorCode, ElicitationRequiredError, InvalidParamsError
-from logger_config import setup_logger, get_trace_id
+from errors import AppError, ErrorCode, ElicitationRequiredError, InvalidParamsError, InternalError
+from logger_config import setup_logger, get_trace_id, bind_trace_id, reset_trace_id
 
 # 引入 Logic 模块
-from Logic import calculate_liquidated_damages, InvalidParamsError as LogicInvalidParamsError, InternalError as LogicInternalError
+from Logic import RedLineInterceptors, calculate_liquidated_damages, calculate_liquidated_damages_batch, InvalidParamsError as LogicInvalidParamsError, InternalError as LogicInternalError
 
 # 引入 Contract Logic 模块
 from contract_logic import ContractLogic, evaluate_judicial_discretion
@@ -58,12 +73,57 @@ from contract_logic import ContractLogic, evaluate_judicial_discretion
 from legal_resources import LegalResourceProvider
 
 
-# 加载环境变量
+# 加载环境变量 (仅在导入模块时执行一次，LegalCNServer 实例化时不再读取 .env)
 load_dotenv()
 
 # 初始化日志
 logger = setup_logger()
 
+# health_check 子检查结果的缓存时长 (秒)，多个探针的密集探测在此时间内共用一次检查
+_HEALTH_CHECK_TTL = 5.0
+
+# batch_execute 默认的最大并发子调用数
+_BATCH_MAX_CONCURRENT = 8
+
+# check_contract_risk 未指定 check_types 时的默认检查类型 (不可变，所有调用共用)
+_DEFAULT_CHECK_TYPES = ("jurisdiction", "penalty")
+
+# calculate_damages_batch 各案件字段的默认值；月数字段与 calculate_damages 的 schema 一致须为整数
+_BATCH_CASE_DEFAULTS = {
+    "scenario": "general_contract",
+    "actual_loss": 0.0,
+    "expectation_loss": 0.0,
+    "mitigation_benefit": 0.0,
+    "performance_ratio": 1.0,
+    "fault_score": 1.0,
+    "rate": 0.0,
+    "training_cost": 0.0,
+    "total_months": 12,
+    "remaining_months": 0,
+}
+_BATCH_INT_FIELDS = frozenset({"total_months", "remaining_months"})
+
+
+def _dumps_result(data: Any, pretty: bool = False) -> str:
+    """序列化工具结果：默认紧凑格式，调试模式下缩进输出；orjson 不支持的类型 (如 numpy 标量) 回退到标准库"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(data, option=option).decode("utf-8")
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _describe_arguments(arguments: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """调试输出用的参数摘要：字符串参数只报告长度，其余参数只报告类型名"""
+    return {
+        key: len(value) if isinstance(value, str) else type(value).__name__
+        for key, value in (arguments or {}).items()
+    }
+
 
 class LegalCNServer:
     """
@@ -87,141 +147,54 @@ class LegalCNServer:
         self.app = Server(self.name)
         
         # 初始化隐私增强组件
-        self.privacy_middleware = PrivacyPreservingMAE()
+        self.privacy_middleware = get_mae()
 
         # 初始化法律资源提供者
         self.legal_resource_provider = LegalResourceProvider()
+
+        # health_check 子检查结果缓存: (检查时间, 成熟度检查, 一致性检查)
+        self._health_cache: Optional[Tuple[float, Dict[str, Any], Dict[str, Any]]] = None
+
+        # 工具分派表：构造时生成一次，按名称 O(1) 查找；处理函数统一为 (arguments, trace_id) -> 结果字典
+        self._tool_handlers: Dict[str, Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]]] = {
+            "check_contract_risk": lambda arguments, trace_id: self._check_contract_risk_data(arguments),
+            "analyze_legal_clause": lambda arguments, trace_id: self._analyze_legal_clause_data(arguments),
+            "get_legal_suggestion": lambda arguments, trace_id: self._get_legal_suggestion_data(arguments),
+            "calculate_damages": self._calculate_damages_data,
+            "calculate_damages_batch": self._calculate_damages_batch_data,
+            "evaluate_judicial_discretion": self._evaluate_judicial_discretion_data,
+            "batch_execute": self._batch_execute_data,
+            "health_check": self._health_check_tool_data,
+        }
+
+        # 提示词分派表，与工具分派表同样在构造时生成一次
+        self._prompt_handlers: Dict[str, Callable[[Dict[str, str]], GetPromptResult]] = {
+            "contract_review_flow": self._get_contract_review_prompt,
+            "risk_assessment_template": self._get_risk_assessment_prompt,
+        }
         
         # 注册处理器
         self._register_handlers()
         
         if self.debug:
-            print(f"[DEBUG] {self.name} v{self.version} 初始化完成")
+            # stdio 模式下 stdout 承载 MCP 协议帧，调试输出写到 stderr
+            print(f"[DEBUG] {self.name} v{self.version} 初始化完成", file=sys.stderr)
         
         logger.info("Server initialized", extra={"trace_id": get_trace_id(), "version": self.version, "debug": self.debug})
     
     def _register_handlers(self):
         """注册 MCP 协议处理器"""
+        # 工具、资源与提示词列表与请求无关，构造时生成一次，列表请求直接返回缓存
+        self._tools_cache = self._build_tools()
+        self._resources_cache = self._build_resources()
+        self._resources_version = self.legal_resource_provider.resources_version
+        self._prompts_cache = self._build_prompts()
         
         # 注册 Tools 列表处理器
         @self.app.list_tools()
         async def list_tools() -> List[Tool]:
             """返回所有可用的工具列表"""
-            return [
-                Tool(
-                    name="check_contract_risk",
-                    description="检查合同文本中的法律风险,识别管辖权、违约金等关键条款",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "contract_text": {
-                                "type": "string",
-                                "description": "合同文本内容"
-                            },
-                            "check_types": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "检查类型,可选: jurisdiction(管辖权), penalty(违约金), liability(责任条款)",
-                                "default": ["jurisdiction", "penalty"]
-                            }
-                        },
-                        "required": ["contract_text"]
-                    }
-                ),
-                Tool(
-                    name="analyze_legal_clause",
-                    description="分析特定法律条款的合规性,基于《民法典》进行评估",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "clause_text": {
-                                "type": "string",
-                                "description": "需要分析的条款文本"
-                            },
-                            "clause_type": {
-                                "type": "string",
-                                "enum": ["penalty", "liability", "termination", "jurisdiction"],
-                                "description": "条款类型"
-                            }
-                        },
-                        "required": ["clause_text", "clause_type"]
-                    }
-                ),
-                Tool(
-                    name="get_legal_suggestion",
-                    description="根据风险类型获取法律建议和修改方案",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "risk_type": {
-                                "type": "string",
-                                "enum": ["jurisdiction", "penalty", "liability", "general"],
-                                "description": "风险类型"
-                            },
-                            "context": {
-                                "type": "string",
-                                "description": "具体情况描述"
-                            }
-                        },
-                        "required": ["risk_type"]
-                    }
-                ),
-                Tool(
-                    name="calculate_damages",
-                    description="计算违约金，包含法律红线检查 (民间借贷利率封顶、劳动合同违约金上限)",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "scenario": {
-                                "type": "string",
-                                "enum": ["general_contract", "private_lending", "labor_contract"],
-                                "description": "场景类型"
-                            },
-                            "actual_loss": {"type": "number", "description": "实际损失"},
-                            "rate": {"type": "number", "description": "利率 (民间借贷场景)"},
-                            "training_cost": {"type": "number", "description": "培训费用 (劳动合同场景)"},
-                            "total_months": {"type": "integer", "description": "服务期总月数 (劳动合同场景)"},
-                            "remaining_months": {"type": "integer", "description": "剩余月数 (劳动合同场景)"},
-                            "simulate_db_failure": {"type": "boolean", "description": "是否模拟数据库同步失败 (测试用)"}
-                        },
-                        "required": ["scenario"]
-                    }
-                ),
-                Tool(
-                    name="evaluate_judicial_discretion",
-                    description="基于《九民纪要》与司法解释的裁量权行使标准评估违约金",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "loss": {
-                                "description": "实际损失金额或 PID (Resolves to {amount: float})",
-                                "anyOf": [{"type": "number"}, {"type": "string"}]
-                            },
-                            "performance": {
-                                "description": "合同履行比例 (0.0-1.0) 或 PID (Resolves to {ratio: float})",
-                                "anyOf": [{"type": "number"}, {"type": "string"}]
-                            },
-                            "fault": {
-                                "description": "过错程度评分 (1.0-2.0, 2.0为恶意) 或 PID (Resolves to {score: float})",
-                                "anyOf": [{"type": "number"}, {"type": "string"}]
-                            },
-                            "contract_pid": {
-                                "type": "string",
-                                "description": "关联的合同 PID (可选)"
-                            }
-                        },
-                        "required": ["loss", "performance", "fault"]
-                    }
-                ),
-                Tool(
-                    name="health_check",
-                    description="服务器健康检查探针",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {},
-                    }
-                )
-            ]
+            return self._tools_cache
         
         # 注册 Tools 调用处理器
         @self.app.call_tool()
@@ -232,28 +205,20 @@ class LegalCNServer:
         @self.app.list_resources()
         async def list_resources() -> List[Resource]:
             """返回所有可用的资源列表"""
-            resources = []
-            for uri, meta in self.legal_resource_provider.resources.items():
-                resources.append(Resource(
-                    uri=uri,
-                    name=meta.get("name", "Unknown Resource"),
-                    description=meta.get("description", f"Legal resource: {meta.get('name')}"),
-                    mimeType="application/json+ld"  # Updated MIME type for JSON-LD wrapped content
-                ))
-            return resources
+            return self._current_resources()
         
         # 注册 Resources 读取处理器
         @self.app.read_resource()
         async def read_resource(uri: str) -> str:
             """读取指定资源的内容 (返回 FDO 兼容的 JSON-LD)"""
             trace_id = get_trace_id()
-            logger.info(f"Reading resource: {uri}", extra={"trace_id": trace_id})
+            logger.info("Reading resource: %s", uri, extra={"trace_id": trace_id})
             
             try:
                 content = self.legal_resource_provider.get_resource_content(uri)
                 return content
             except ValueError as e:
-                logger.warning(f"Resource not found: {uri}", extra={"trace_id": trace_id})
+                logger.warning("Resource not found: %s", uri, extra={"trace_id": trace_id})
                 raise InvalidParamsError(f"未知资源: {uri}")
             except Exception as e:
                 logger.exception("Error reading resource", extra={"trace_id": trace_id})
@@ -263,30 +228,7 @@ class LegalCNServer:
         @self.app.list_prompts()
         async def list_prompts() -> List[Prompt]:
             """返回所有可用的提示词模板"""
-            return [
-                Prompt(
-                    name="contract_review_flow",
-                    description="标准合同审查工作流程",
-                    arguments=[
-                        {
-                            "name": "contract_type",
-                            "description": "合同类型 (如: 买卖合同、服务合同等)",
-                            "required": False
-                        }
-                    ]
-                ),
-                Prompt(
-                    name="risk_assessment_template",
-                    description="风险评估报告模板",
-                    arguments=[
-                        {
-                            "name": "company_name",
-                            "description": "公司名称",
-                            "required": True
-                        }
-                    ]
-                )
-            ]
+            return self._prompts_cache
         
         # 注册 Prompts 获取处理器
         @self.app.get_prompt()
@@ -294,119 +236,378 @@ class LegalCNServer:
             """获取指定提示词的内容"""
             
             if self.debug:
-                print(f"[DEBUG] 获取提示词: {name}, 参数: {arguments}")
-            
-            if name == "contract_review_flow":
-                return self._get_contract_review_prompt(arguments or {})
-            
-            elif name == "risk_assessment_template":
-                return self._get_risk_assessment_prompt(arguments or {})
+                # 只输出参数名与长度，不输出参数内容 (可能含企业名称等信息，且长文本的 repr 开销较大)
+                print(f"[DEBUG] 获取提示词: {name}, 参数: {_describe_arguments(arguments)}", file=sys.stderr)
             
-            else:
+            handler = self._prompt_handlers.get(name)
+            if handler is None:
                 raise ValueError(f"未知提示词: {name}")
+            return handler(arguments or {})
     
+    def _build_tools(self) -> List[Tool]:
+        """构造工具列表 (含各工具的 inputSchema)"""
+        return [
+            Tool(
+                name="check_contract_risk",
+                description="检查合同文本中的法律风险,识别管辖权、违约金等关键条款",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "contract_text": {
+                            "type": "string",
+                            "description": "合同文本内容"
+                        },
+                        "check_types": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "检查类型,可选: jurisdiction(管辖权), penalty(违约金), liability(责任条款)",
+                            "default": ["jurisdiction", "penalty"]
+                        }
+                    },
+                    "required": ["contract_text"]
+                }
+            ),
+            Tool(
+                name="analyze_legal_clause",
+                description="分析特定法律条款的合规性,基于《民法典》进行评估",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "clause_text": {
+                            "type": "string",
+                            "description": "需要分析的条款文本"
+                        },
+                        "clause_type": {
+                            "type": "string",
+                            "enum": ["penalty", "liability", "termination", "jurisdiction"],
+                            "description": "条款类型"
+                        }
+                    },
+                    "required": ["clause_text", "clause_type"]
+                }
+            ),
+            Tool(
+                name="get_legal_suggestion",
+                description="根据风险类型获取法律建议和修改方案",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "risk_type": {
+                            "type": "string",
+                            "enum": ["jurisdiction", "penalty", "liability", "general"],
+                            "description": "风险类型"
+                        },
+                        "context": {
+                            "type": "string",
+                            "description": "具体情况描述"
+                        }
+                    },
+                    "required": ["risk_type"]
+                }
+            ),
+            Tool(
+                name="calculate_damages",
+                description="计算违约金，包含法律红线检查 (民间借贷利率封顶、劳动合同违约金上限)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "scenario": {
+                            "type": "string",
+                            "enum": ["general_contract", "private_lending", "labor_contract"],
+                            "description": "场景类型"
+                        },
+                        "actual_loss": {"type": "number", "description": "实际损失"},
+                        "rate": {"type": "number", "description": "利率 (民间借贷场景)"},
+                        "training_cost": {"type": "number", "description": "培训费用 (劳动合同场景)"},
+                        "total_months": {"type": "integer", "description": "服务期总月数 (劳动合同场景)"},
+                        "remaining_months": {"type": "integer", "description": "剩余月数 (劳动合同场景)"},
+                        "simulate_db_failure": {"type": "boolean", "description": "是否模拟数据库同步失败 (测试用)"}
+                    },
+                    "required": ["scenario"]
+                }
+            ),
+            Tool(
+                name="calculate_damages_batch",
+                description="批量计算违约金 (向量化)，适用于批量合同审计；触犯红线的案件以 status 标记而非报错",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "cases": {
+                            "type": "array",
+                            "items": {"type": "object"},
+                            "description": "案件列表，每项字段同 calculate_damages (另支持 expectation_loss, mitigation_benefit, performance_ratio, fault_score)"
+                        },
+                        "simulate_db_failure": {"type": "boolean", "description": "是否模拟数据库同步失败 (测试用)"}
+                    },
+                    "required": ["cases"]
+                }
+            ),
+            Tool(
+                name="evaluate_judicial_discretion",
+                description="基于《九民纪要》与司法解释的裁量权行使标准评估违约金",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "loss": {
+                            "description": "实际损失金额或 PID (Resolves to {amount: float})",
+                            "anyOf": [{"type": "number"}, {"type": "string"}]
+                        },
+                        "performance": {
+                            "description": "合同履行比例 (0.0-1.0) 或 PID (Resolves to {ratio: float})",
+                            "anyOf": [{"type": "number"}, {"type": "string"}]
+                        },
+                        "fault": {
+                            "description": "过错程度评分 (1.0-2.0, 2.0为恶意) 或 PID (Resolves to {score: float})",
+                            "anyOf": [{"type": "number"}, {"type": "string"}]
+                        },
+                        "contract_pid": {
+                            "type": "string",
+                            "description": "关联的合同 PID (可选)"
+                        }
+                    },
+                    "required": ["loss", "performance", "fault"]
+                }
+            ),
+            Tool(
+                name="batch_execute",
+                description="在一次调用中并发执行多个工具，结果按操作顺序汇总 (合规元数据与脱敏只处理一次)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "operations": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "name": {"type": "string", "description": "工具名称 (不可嵌套 batch_execute)"},
+                                    "arguments": {"type": "object", "description": "该工具的参数"}
+                                },
+                                "required": ["name"]
+                            },
+                            "description": "待执行的工具调用列表"
+                        },
+                        "maxConcurrent": {"type": "integer", "minimum": 1, "description": "最大并发数 (默认 8)"},
+                        "stopOnError": {"type": "boolean", "description": "任一操作失败时取消其余未完成的操作"}
+                    },
+                    "required": ["operations"]
+                }
+            ),
+            Tool(
+                name="health_check",
+                description="服务器健康检查探针",
+                inputSchema={
+                    "type": "object",
+                    "properties": {},
+                }
+            )
+        ]
+
+    def _build_resources(self) -> List[Resource]:
+        """构造静态资源列表 (静态资源只在 register_resource 时变化)"""
+        return [
+            Resource(
+                uri=meta["uri"],
+                name=meta.get("name", "Unknown Resource"),
+                description=meta.get("description", f"Legal resource: {meta.get('name')}"),
+                mimeType="application/json+ld"  # Updated MIME type for JSON-LD wrapped content
+            )
+            for meta in self.legal_resource_provider.list_resources()
+        ]
+
+    def _current_resources(self) -> List[Resource]:
+        """返回缓存的资源列表，仅在提供者注册了新资源后重建"""
+        version = self.legal_resource_provider.resources_version
+        if version != self._resources_version:
+            self._resources_cache = self._build_resources()
+            self._resources_version = version
+        return self._resources_cache
+
+    def _build_prompts(self) -> List[Prompt]:
+        """构造提示词模板列表"""
+        return [
+            Prompt(
+                name="contract_review_flow",
+                description="标准合同审查工作流程",
+                arguments=[
+                    {
+                        "name": "contract_type",
+                        "description": "合同类型 (如: 买卖合同、服务合同等)",
+                        "required": False
+                    }
+                ]
+            ),
+            Prompt(
+                name="risk_assessment_template",
+                description="风险评估报告模板",
+                arguments=[
+                    {
+                        "name": "company_name",
+                        "description": "公司名称",
+                        "required": True
+                    }
+                ]
+            )
+        ]
+
     async def _handle_call_tool(self, name: str, arguments: Dict[str, Any]) -> List[TextContent]:
         """处理工具调用请求 (提取为方法以便测试)"""
         trace_id = get_trace_id()
-        logger.info(f"Tool called: {name}", extra={"trace_id": trace_id, "arguments": arguments})
+        # 本次调用期间的日志 (含工作线程中的日志) 自动带上 trace_id，无需逐条传 extra
+        token = bind_trace_id(trace_id)
+        try:
+            return await self._call_tool(name, arguments, trace_id)
+        finally:
+            reset_trace_id(token)
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any], trace_id: str) -> List[TextContent]:
+        """执行工具调用：授权检查、工具分派、元数据注入与输出脱敏"""
+        logger.info("Tool called: %s", name, extra={"trace_id": trace_id, "arguments": arguments})
         
         try:
             # 1. 实现 Elicitation 动态授权钩子
             elicitation_msg = self.privacy_middleware.check_elicitation_requirement(arguments)
             if elicitation_msg:
-                logger.warning("Elicitation required", extra={"trace_id": trace_id, "reason": elicitation_msg})
+                logger.warning("Elicitation required: %s", elicitation_msg)
                 raise ElicitationRequiredError(f"[Elicitation Required] {elicitation_msg}")
 
-            # 2. 执行工具逻辑
-            result_contents: List[TextContent] = []
-            
-            if name == "check_contract_risk":
-                # Inject trace_id into kwargs if supported by _check_contract_risk or underlying logic
-                # For this specific refactor, we are focusing on Logic.py integration
-                # Let's see if check_contract_risk uses Logic.py. It seems it uses basic string matching currently.
-                # But let's add causal_trace_id to arguments for logging purpose if needed down the line.
-                result_contents = await self._check_contract_risk(arguments)
-            elif name == "analyze_legal_clause":
-                # analyze_legal_clause mostly returns static analysis, but let's check if we can enhance it.
-                result_contents = await self._analyze_legal_clause(arguments)
-            elif name == "get_legal_suggestion":
-                result_contents = await self._get_legal_suggestion(arguments)
-            elif name == "calculate_damages":
-                # New tool exposing the Logic.py calculation
-                result_contents = await self._calculate_damages(arguments, trace_id)
-            elif name == "evaluate_judicial_discretion":
-                # New tool exposing the contract_logic.py calculation
-                result_contents = await self._evaluate_judicial_discretion(arguments, trace_id)
-            elif name == "health_check":
-                # Health check implementation with maturity and consistency check
-                maturity_check = self._check_transcription_maturity()
-                consistency_check = self._check_legal_db_consistency()
-        
-                health_status = {
-                    "status": "healthy" if maturity_check["status"] == "ok" and consistency_check["status"] == "ok" else "unhealthy",
-                    "version": self.version,
-                    "timestamp": os.popen("date -u +%Y-%m-%dT%H:%M:%SZ").read().strip(),
-                    "checks": {
-                        "transcription_maturity": maturity_check,
-                        "legal_db_consistency": consistency_check
-                    }
-                }
-                
-                result_contents = [TextContent(type="text", text=json.dumps(health_status, ensure_ascii=False))]
-            else:
-                logger.error(f"Unknown tool: {name}", extra={"trace_id": trace_id})
-                raise InvalidParamsError(f"未知工具: {name}")
+            # 2. 执行工具逻辑 (各工具返回结果字典，统一在下方序列化)
+            result_data = await self._dispatch_tool_data(name, arguments, trace_id)
                 
         except AppError as e:
-            logger.error(f"AppError in tool execution: {e.message}", extra={"trace_id": trace_id, "error_code": e.code.value})
+            logger.error(f"AppError in tool execution: {e.message} (code {e.code.value})")
             # 将结构化错误返回给 Client (实际协议中可能需要特定格式，这里转为 TextContent)
-            return [TextContent(type="text", text=json.dumps(e.to_dict(), ensure_ascii=False))]
+            return [TextContent(type="text", text=_dumps_result(e.to_dict()))]
             
         except Exception as e:
-            logger.exception("Unexpected error during tool execution", extra={"trace_id": trace_id})
-            return [TextContent(type="text", text=json.dumps({
+            logger.exception("Unexpected error during tool execution")
+            return [TextContent(type="text", text=_dumps_result({
                 "code": ErrorCode.INTERNAL_ERROR.value,
                 "error": "Internal Error",
                 "message": str(e)
-            }, ensure_ascii=False))]
+            }))]
 
         # 3. Privacy Preserving (输出脱敏) & Metadata Injection
-        processed_contents = []
-        for content in result_contents:
-            if content.type == "text":
-                try:
-                    # 尝试解析 JSON 进行结构化处理
-                    data = json.loads(content.text)
-                    
-                    # 注入合规元数据 (gb_45438_compliance)
-                    data = self.privacy_middleware.inject_compliance_metadata(data)
-                    
-                    # 序列化后进行脱敏
-                    text_str = json.dumps(data, ensure_ascii=False, indent=2)
-                    masked_text = self.privacy_middleware.mask_sensitive_data(text_str)
-                    
-                    processed_contents.append(TextContent(
-                        type="text",
-                        text=masked_text
-                    ))
-                except json.JSONDecodeError:
-                    # 如果不是 JSON，直接对文本进行脱敏
-                    masked_text = self.privacy_middleware.mask_sensitive_data(content.text)
-                    processed_contents.append(TextContent(
-                        type="text",
-                        text=masked_text
-                    ))
-            else:
-                processed_contents.append(content)
-        
-        return processed_contents
-        
+        # 序列化之前逐个字符串值脱敏 (可能是手机号等的整数同样脱敏)，浮点数与 PID、追踪 ID 字段不再随整段 JSON 文本进入正则扫描；
+        # 合规元数据 (gb_45438_compliance) 不含个人信息，脱敏后再注入，最后只序列化一次
+        # 工具结果可能引用其他模块持有的字典 (如缓存的健康检查结果)，注入前复制顶层，不修改调用方的数据
+        masked = self.privacy_middleware.mask_result(result_data)
+        data = self.privacy_middleware.inject_compliance_metadata(dict(masked))
+        return [TextContent(type="text", text=_dumps_result(data, pretty=self.debug))]
+
+    async def _dispatch_tool_data(self, name: str, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """按工具名查分派表执行，返回未序列化的结果字典"""
+        handler = self._tool_handlers.get(name)
+        if handler is None:
+            logger.error(f"Unknown tool: {name}")
+            raise InvalidParamsError(f"未知工具: {name}")
+        return await handler(arguments, trace_id)
+
+    def _json_contents(self, result: Dict[str, Any]) -> List[TextContent]:
+        """把工具结果包装为 TextContent 列表 (供直接调用各工具方法的场景使用)"""
+        return [TextContent(type="text", text=_dumps_result(result, pretty=True))]
+
+    def _health_check_data(self) -> Dict[str, Any]:
+        """Health check implementation with maturity and consistency check"""
+        now = time.monotonic()
+        cached = self._health_cache
+        if cached is None or now - cached[0] >= _HEALTH_CHECK_TTL:
+            cached = self._health_cache = (now, self._check_transcription_maturity(), self._check_legal_db_consistency())
+        _, maturity_check, consistency_check = cached
+
+        return {
+            "status": "healthy" if maturity_check["status"] == "ok" and consistency_check["status"] == "ok" else "unhealthy",
+            "version": self.version,
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "checks": {
+                "transcription_maturity": maturity_check,
+                "legal_db_consistency": consistency_check
+            }
+        }
+
+    async def _batch_execute_data(self, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """并发执行多个工具调用，返回按操作顺序排列的结果汇总 (单个操作失败不影响其余操作，除非 stopOnError)"""
+        operations = arguments.get("operations")
+        if not isinstance(operations, list) or not operations:
+            raise InvalidParamsError("operations 必须是非空列表")
+        max_concurrent = arguments.get("maxConcurrent", _BATCH_MAX_CONCURRENT)
+        if not isinstance(max_concurrent, int) or isinstance(max_concurrent, bool) or max_concurrent < 1:
+            raise InvalidParamsError("maxConcurrent 必须是正整数")
+        stop_on_error = bool(arguments.get("stopOnError", False))
+
+        semaphore = asyncio.Semaphore(max_concurrent)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+
+        async def run(index: int, operation: Any) -> None:
+            async with semaphore:
+                results[index] = entry = await self._batch_operation(index, operation, trace_id)
+            if stop_on_error and entry["status"] == "error":
+                # 取消其余仍在排队或执行中的操作，它们在结果中标记为 cancelled
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+
+        # 未使用 asyncio.TaskGroup (Python 3.11+)，以保持对 Python 3.10 的兼容
+        tasks = [asyncio.create_task(run(i, op)) for i, op in enumerate(operations)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        counts = {"ok": 0, "error": 0, "cancelled": 0}
+        for index, entry in enumerate(results):
+            if entry is None:
+                entry = results[index] = {"index": index, "name": self._batch_operation_name(operations[index]), "status": "cancelled"}
+            counts[entry["status"]] += 1
+        return {
+            "results": results,
+            "summary": {
+                "total": len(results),
+                "succeeded": counts["ok"],
+                "failed": counts["error"],
+                "cancelled": counts["cancelled"],
+            },
+        }
+
+    @staticmethod
+    def _batch_operation_name(operation: Any) -> Any:
+        return operation.get("name") if isinstance(operation, dict) else None
+
+    async def _batch_operation(self, index: int, operation: Any, trace_id: str) -> Dict[str, Any]:
+        """执行 batch_execute 中的单个操作，把异常转为该操作的错误条目"""
+        name = self._batch_operation_name(operation)
+        try:
+            if not isinstance(operation, dict) or not isinstance(name, str):
+                raise InvalidParamsError(f"第 {index} 个操作缺少工具名称")
+            if name == "batch_execute":
+                raise InvalidParamsError("batch_execute 不可嵌套调用")
+            sub_arguments = operation.get("arguments") or {}
+            if not isinstance(sub_arguments, dict):
+                raise InvalidParamsError(f"第 {index} 个操作的 arguments 必须是对象")
+            result = await self._dispatch_tool_data(name, sub_arguments, trace_id)
+            return {"index": index, "name": name, "status": "ok", "result": result}
+        except AppError as e:
+            logger.warning("Batch operation %d (%s) failed: %s (code %s)", index, name, e.message, e.code.value)
+            return {"index": index, "name": name, "status": "error", "error": e.to_dict()}
+        except Exception as e:
+            logger.exception(f"Unexpected error in batch operation {index} ({name})")
+            return {"index": index, "name": name, "status": "error", "error": {
+                "code": ErrorCode.INTERNAL_ERROR.value,
+                "error": "Internal Error",
+                "message": str(e)
+            }}
+
+    async def _health_check_tool_data(self, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """health_check 工具入口 (与分派表的统一签名对齐)"""
+        return self._health_check_data()
+
     async def _check_contract_risk(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """检查合同风险"""
+        return self._json_contents(await self._check_contract_risk_data(arguments))
+
+    async def _check_contract_risk_data(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """检查合同风险，返回结果字典"""
         contract_text = arguments.get("contract_text", "")
-        check_types = arguments.get("check_types", ["jurisdiction", "penalty"])
+        check_types = arguments.get("check_types", _DEFAULT_CHECK_TYPES)
         
-        result = self.logic.check_contract_risk(contract_text, check_types)
+        # 关键词扫描与 PID 落盘都是同步操作，放到工作线程执行，事件循环可继续处理其他请求
+        result = await asyncio.to_thread(self.logic.check_contract_risk, contract_text, check_types)
         
         # Generate a PID for this report
         # In a real scenario, we might want to link this to a parent document PID if provided in arguments
@@ -418,45 +619,48 @@ class LegalCNServer:
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
         
-        report_pid = self.legal_resource_provider.generate_pid(result, metadata, parent_pid)
+        report_pid = await asyncio.to_thread(self.legal_resource_provider.generate_pid, result, metadata, parent_pid)
         
         # Inject PID into the result
         result["report_pid"] = report_pid
         if parent_pid:
             result["related_to"] = parent_pid
 
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, ensure_ascii=False, indent=2)
-        )]
+        return result
     
     async def _analyze_legal_clause(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """分析法律条款的合规性"""
+        return self._json_contents(await self._analyze_legal_clause_data(arguments))
+
+    async def _analyze_legal_clause_data(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """分析法律条款的合规性，返回结果字典"""
         clause_text = arguments.get("clause_text", "")
         clause_type = arguments.get("clause_type", "general")
         
-        result = self.logic.analyze_legal_clause(clause_text, clause_type)
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, ensure_ascii=False, indent=2)
-        )]
+        return self.logic.analyze_legal_clause(clause_text, clause_type)
     
     async def _get_legal_suggestion(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """获取法律建议"""
+        return self._json_contents(await self._get_legal_suggestion_data(arguments))
+
+    async def _get_legal_suggestion_data(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """获取法律建议，返回结果字典"""
         risk_type = arguments.get("risk_type", "general")
         context = arguments.get("context", "")
         
-        result = self.logic.get_legal_suggestion(risk_type, context)
-        
-        return [TextContent(
-            type="text",
-            text=json.dumps(result, ensure_ascii=False, indent=2)
-        )]
+        return self.logic.get_legal_suggestion(risk_type, context)
 
     async def _calculate_damages(self, arguments: Dict[str, Any], trace_id: str) -> List[TextContent]:
         """调用 Logic.py 进行违约金计算，包含红线检查"""
+        return self._json_contents(await self._calculate_damages_data(arguments, trace_id))
+
+    async def _calculate_damages_data(self, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """调用 Logic.py 进行违约金计算，返回结果字典"""
         try:
+            if arguments.get("scenario") == "private_lending" and not arguments.get("simulate_db_failure", False):
+                # 异步预取 LPR 写入缓存，并发请求只触发一次上游查询，随后的同步计算直接命中缓存
+                await RedLineInterceptors.get_latest_lpr_async()
+
             result = calculate_liquidated_damages(
                 scenario=arguments.get("scenario"),
                 actual_loss=arguments.get("actual_loss", 0.0),
@@ -467,35 +671,93 @@ class LegalCNServer:
                 simulate_db_failure=arguments.get("simulate_db_failure", False),
                 causal_trace_id=trace_id
             )
-            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+            return result
         
         # 捕获 Logic.py 抛出的自定义异常，并在 Server 层转译为 AppError
         # 虽然 server.py 里已经捕获了 AppError，但这里我们可以做更细致的日志或者转换
         except LogicInvalidParamsError as e:
             # Logic 层抛出的 InvalidParamsError 已经是 AppError 的子类
-            logger.warning(f"Logic invalid params: {e.message}", extra={"trace_id": trace_id, "details": e.details})
+            logger.warning("Logic invalid params: %s", e.message)
             raise e
         except LogicInternalError as e:
             # Logic 层抛出的 InternalError 已经是 AppError 的子类
-            logger.error(f"Logic internal error: {e.message}", extra={"trace_id": trace_id})
+            logger.error(f"Logic internal error: {e.message}")
             raise e
         except Exception as e:
-            logger.exception("Unexpected error in calculation", extra={"trace_id": trace_id})
+            logger.exception("Unexpected error in calculation")
             raise InternalError(f"Calculation failed: {str(e)}")
 
+    async def _calculate_damages_batch(self, arguments: Dict[str, Any], trace_id: str) -> List[TextContent]:
+        """调用 Logic.py 批量计算违约金"""
+        return self._json_contents(await self._calculate_damages_batch_data(arguments, trace_id))
+
+    async def _calculate_damages_batch_data(self, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """调用 Logic.py 批量计算违约金，返回结果字典"""
+        cases = arguments.get("cases")
+        if not isinstance(cases, list):
+            raise InvalidParamsError("cases 必须是列表")
+        for index, case in enumerate(cases):
+            if not isinstance(case, dict):
+                raise InvalidParamsError(f"第 {index} 个案件必须是对象")
+            if not isinstance(case.get("scenario", ""), str):
+                raise InvalidParamsError(f"第 {index} 个案件的 scenario 必须是字符串")
+            for key, value in case.items():
+                if key == "scenario" or key not in _BATCH_CASE_DEFAULTS:
+                    continue
+                is_int_field = key in _BATCH_INT_FIELDS
+                # bool 是 int 的子类，需单独排除
+                if isinstance(value, bool) or not isinstance(value, int if is_int_field else (int, float)):
+                    raise InvalidParamsError(
+                        f"第 {index} 个案件的 {key} 必须是{'整数' if is_int_field else '数值'}",
+                        details={"index": index, "field": key}
+                    )
+        arrays = {key: [case.get(key, default) for case in cases] for key, default in _BATCH_CASE_DEFAULTS.items()}
+
+        try:
+            if "private_lending" in arrays["scenario"] and not arguments.get("simulate_db_failure", False):
+                await RedLineInterceptors.get_latest_lpr_async()
+
+            batch = await asyncio.to_thread(
+                calculate_liquidated_damages_batch,
+                arrays,
+                simulate_db_failure=arguments.get("simulate_db_failure", False)
+            )
+        except LogicInternalError as e:
+            logger.error(f"Logic internal error: {e.message}")
+            raise e
+        except Exception as e:
+            logger.exception("Unexpected error in batch calculation")
+            raise InternalError(f"Batch calculation failed: {str(e)}")
+
+        results = [
+            {
+                "scenario": scenario,
+                "final_suggestion": None if status else float(value),
+                "status": int(status)
+            }
+            for scenario, value, status in zip(arrays["scenario"], batch["final_suggestion"], batch["status"])
+        ]
+        return {"count": len(results), "results": results, "causal_trace_id": trace_id}
+
     async def _evaluate_judicial_discretion(self, arguments: Dict[str, Any], trace_id: str) -> List[TextContent]:
         """调用 contract_logic.py 进行司法裁量权评估"""
+        return self._json_contents(await self._evaluate_judicial_discretion_data(arguments, trace_id))
+
+    async def _evaluate_judicial_discretion_data(self, arguments: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+        """调用 contract_logic.py 进行司法裁量权评估，返回结果字典"""
         try:
-            result = evaluate_judicial_discretion(
+            # PID 解析可能触发首次从磁盘加载 PID 存储，放到工作线程执行
+            result = await asyncio.to_thread(
+                evaluate_judicial_discretion,
                 loss_param=arguments.get("loss"),
                 performance_param=arguments.get("performance"),
                 fault_param=arguments.get("fault"),
                 contract_pid=arguments.get("contract_pid"),
                 resource_provider=self.legal_resource_provider
             )
-            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+            return result
         except Exception as e:
-            logger.exception("Unexpected error in judicial discretion evaluation", extra={"trace_id": trace_id})
+            logger.exception("Unexpected error in judicial discretion evaluation")
             raise InternalError(f"Evaluation failed: {str(e)}")
 
     # ==================== Health Check Helpers ====================
@@ -594,5 +856,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    if uvloop is not None:
+        # 基于 libuv 的事件循环，stdio 读写与任务调度的开销低于默认事件循环
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -40,7 +40,7 @@ if [ -f "requirements.txt" ]; then
     pip install -r requirements.txt
 else
     echo "⚠️  requirements.txt 不存在,手动安装核心依赖..."
-    pip install mcp fastmcp requests python-dotenv pandas
+    pip install mcp fastmcp requests python-dotenv pandas numpy
 fi
 
 # 创建 .env 文件模板
@@ -1,7 +1,7 @@
 import unittest
 import json
 from unittest.mock import MagicMock
-from contract_logic import evaluate_judicial_discretion, resolve_pid_or_value
+from contract_logic import ContractLogic, evaluate_judicial_discretion, resolve_pid_or_value
 from legal_resources import LegalResourceProvider
 from Logic import calculate_liquidated_damages
 
@@ -99,5 +99,82 @@ class TestContractLogic(unittest.TestCase):
         self.assertEqual(result["result"]["suggested_penalty"], 10000.0)
         self.assertEqual(result["formula"]["components"]["gamma"], 0.0)
 
+    def test_evaluate_unresolved_pids_logged_once(self):
+        """Test unresolved PID inputs produce a single aggregated warning."""
+        self.provider.get_resource_by_pid.return_value = None
+        with self.assertLogs("contract_logic", level="WARNING") as logs:
+            result = evaluate_judicial_discretion(
+                "legal://pid/missing-loss", "legal://pid/missing-perf", 1.5,
+                resource_provider=self.provider
+            )
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("legal://pid/missing-perf", logs.output[0])
+        self.assertEqual(result["inputs"]["loss"]["value"], 0.0)
+
+    def test_evaluation_ids_unique(self):
+        """Test evaluation IDs never repeat within a process."""
+        ids = {
+            evaluate_judicial_discretion(10000.0, 0.5, 1.5, resource_provider=self.provider)["evaluation_id"]
+            for _ in range(100)
+        }
+        self.assertEqual(len(ids), 100)
+
+    def test_check_contract_risk_keywords(self):
+        """Test single-pass keyword scan detects each risk category."""
+        logic = ContractLogic()
+        result = logic.check_contract_risk(
+            "争议提交纽约仲裁委员会仲裁, 违约方支付100%违约金, 甲方不承担任何责任",
+            ["jurisdiction", "penalty", "liability"]
+        )
+        self.assertEqual(result["risk_count"], 3)
+        self.assertEqual([r["type"] for r in result["risks"]], ["jurisdiction", "penalty", "liability"])
+
+        result = logic.check_contract_risk("Hong Kong arbitration", ["jurisdiction", "penalty"])
+        self.assertEqual([r["description"] for r in result["risks"]], ["检测到香港管辖权条款", "未检测到违约金或赔偿条款"])
+
+    def test_check_contract_risk_findings_not_shared(self):
+        """Test mutating a returned finding does not change later results."""
+        logic = ContractLogic()
+        first = logic.check_contract_risk("纽约仲裁", ["jurisdiction"])
+        first["risks"][0]["suggestion"] = "Use a domestic arbitration body"
+        second = logic.check_contract_risk("纽约仲裁", ["jurisdiction"])
+        self.assertEqual(second["risks"][0]["suggestion"], "建议修改为: 北京仲裁委员会或上海仲裁委员会")
+        self.assertIsNot(second["risks"][0], first["risks"][0])
+        # Findings are plain dicts, so the standard json module can serialize them
+        self.assertEqual(json.loads(json.dumps(second))["risks"][0]["level"], "高风险")
+
+    def test_analyze_jurisdiction_clause(self):
+        """Test domestic place names are picked up by the shared keyword scan."""
+        logic = ContractLogic()
+        result = logic.analyze_legal_clause("争议由深圳国际仲裁院仲裁", "jurisdiction")
+        self.assertEqual(result["compliance_status"], "合规")
+
+        result = logic.analyze_legal_clause("争议由纽约法院管辖", "jurisdiction")
+        self.assertEqual(result["compliance_status"], "需要审查")
+        self.assertEqual(result["suggestions"], ["建议选择与合同有实际联系的地点"])
+
+    def test_legal_suggestion_returns_copy(self):
+        """Test mutating a returned suggestion does not leak into later calls."""
+        logic = ContractLogic()
+        first = logic.get_legal_suggestion("general", "")
+        first["x"] = 1
+        first["recommendations"].append("extra")
+        second = logic.get_legal_suggestion("general", "")
+        self.assertNotIn("x", second)
+        self.assertNotIn("extra", second["recommendations"])
+        self.assertEqual(logic.get_legal_suggestion("penalty", "跨境")["context"], "跨境")
+        # The shared table itself is read-only
+        from contract_logic import _SUGGESTIONS
+        with self.assertRaises(TypeError):
+            _SUGGESTIONS["general"]["x"] = 1
+
+    def test_static_resources_precomputed(self):
+        """Test static resource payloads are built once and shared across instances."""
+        logic, other = ContractLogic(), ContractLogic()
+        self.assertIs(logic.get_penalty_rules(), other.get_penalty_rules())
+        self.assertIs(logic.get_contract_checklist(), other.get_contract_checklist())
+        self.assertIs(logic.get_civil_code_contract(), other.get_civil_code_contract())
+        self.assertIsInstance(json.loads(logic.get_penalty_rules()), dict)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,20 +1,21 @@
 import unittest
 import os
 import json
+import tempfile
+import threading
 from unittest.mock import MagicMock, patch
 from legal_resources import LegalResourceProvider, PID_PREFIX, MCP_LEGAL_PREFIX
 
 class TestLegalResourceProvider(unittest.TestCase):
     def setUp(self):
-        # Use a temporary file for testing
-        self.test_pid_file = "test_pids.json"
+        # Keep the PID snapshot and journal in a per-test temporary directory,
+        # removed as a whole on cleanup instead of deleting each file
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.test_pid_file = os.path.join(tmp_dir.name, "test_pids.json")
+        # PIDs load lazily, so read-only tests never touch the file system
         self.provider = LegalResourceProvider(pid_file_path=self.test_pid_file)
 
-    def tearDown(self):
-        # Clean up temporary file
-        if os.path.exists(self.test_pid_file):
-            os.remove(self.test_pid_file)
-
     def test_list_resources(self):
         resources = self.provider.list_resources()
         self.assertTrue(len(resources) > 0)
@@ -36,6 +37,39 @@ class TestLegalResourceProvider(unittest.TestCase):
         self.assertIn("mainEntity", data)
         self.assertIn("articles", data["mainEntity"])
 
+    def test_static_resource_jsonld_cached(self):
+        uri = "legal://rules/penalty-assessment"
+        first = self.provider.get_resource_content(uri)
+        self.assertIs(first, self.provider.get_resource_content(uri))
+        # Non-ASCII must be emitted verbatim, not \u-escaped
+        self.assertIn("违约金", first)
+
+    def test_register_resource_refreshes_caches(self):
+        uri = "legal://rules/penalty-assessment"
+        first = self.provider.get_resource_content(uri)
+        version = self.provider.resources_version
+
+        self.provider.register_resource(uri, "违约金规则", "Updated rules", {"rule": "v2"})
+        self.assertEqual(self.provider.resources_version, version + 1)
+        second = self.provider.get_resource_content(uri)
+        self.assertIsNot(first, second)
+        self.assertIn('"v2"', second)
+
+    def test_pids_loaded_lazily(self):
+        provider = LegalResourceProvider(pid_file_path=self.test_pid_file)
+        provider.get_resource_content("legal://civil-code/contract")
+        self.assertNotIn("_pids", provider.__dict__)
+        self.assertIsNone(provider.get_resource_by_pid(PID_PREFIX + "missing"))
+        self.assertIn("_pids", provider.__dict__)
+
+    def test_iso_now_format(self):
+        from datetime import datetime, timezone
+        from legal_resources import _iso_now
+        stamp = _iso_now()
+        self.assertRegex(stamp, r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}Z$")
+        parsed = datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+        self.assertLess(abs((datetime.now(timezone.utc) - parsed).total_seconds()), 5)
+
     def test_pid_generation_and_retrieval(self):
         content = {"test": "data", "value": 123}
         metadata = {"name": "Test Resource", "type": "Test"}
@@ -58,6 +92,83 @@ class TestLegalResourceProvider(unittest.TestCase):
         data_again = json.loads(retrieved_again)
         self.assertEqual(data_again["mainEntity"], content)
 
+    def test_pid_handle_survives_masking(self):
+        # A digit-heavy handle is hyphenated, so response masking leaves the PID resolvable
+        from privacy_middleware import get_mae
+        with patch('legal_resources.secrets.token_hex', return_value="6d10a77930b5e500955251039792092f"):
+            pid_uri = self.provider.generate_pid({"n": 1}, {"type": "Test"})
+        self.assertEqual(pid_uri, PID_PREFIX + "6d10a779-30b5-e500-9552-51039792092f")
+        self.assertEqual(get_mae().mask_sensitive_data(pid_uri), pid_uri)
+        self.assertEqual(json.loads(self.provider.get_resource_content(pid_uri))["@id"], pid_uri)
+
+    def test_pid_jsonld_cached_and_invalidated(self):
+        pids = [self.provider.generate_pid({"n": i}, {"type": "Test"}) for i in range(3)]
+        first = self.provider.get_resource_content(pids[0])
+        self.assertIs(first, self.provider.get_resource_content(pids[0]))
+
+        self.provider.invalidate(pids[0])
+        self.assertIsNot(first, self.provider.get_resource_content(pids[0]))
+
+        # The cache is bounded and evicts the least recently read PID
+        with patch('legal_resources.PID_JSONLD_CACHE_SIZE', 2):
+            for pid in pids:
+                self.provider.get_resource_content(pid)
+        self.assertEqual(list(self.provider._pid_jsonld), pids[1:])
+
+    def test_pid_journal_compaction(self):
+        with patch('legal_resources.PID_COMPACT_MIN_RECORDS', 3):
+            pids = [self.provider.generate_pid({"n": i}, {"type": "Test"}) for i in range(4)]
+
+        # Three appends triggered compaction into the snapshot; the fourth is journaled
+        with open(self.test_pid_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 3)
+        with open(self.provider.pid_journal_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        new_provider = LegalResourceProvider(pid_file_path=self.test_pid_file)
+        for i, pid in enumerate(pids):
+            self.assertEqual(new_provider.get_resource_by_pid(pid), {"n": i})
+
+    def test_pid_generation_thread_safe(self):
+        # Tools generate PIDs from worker threads; concurrent inserts and compactions must not lose records
+        with patch('legal_resources.PID_COMPACT_MIN_RECORDS', 8):
+            def worker():
+                for i in range(25):
+                    self.provider.generate_pid({"n": i}, {"type": "Test"})
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(self.provider._pids), 100)
+        new_provider = LegalResourceProvider(pid_file_path=self.test_pid_file)
+        self.assertEqual(len(new_provider._pids), 100)
+
+    def test_content_hash_canonical(self):
+        import legal_resources
+        a = {"b": [1, 2], "a": "违约金"}
+        b = {"a": "违约金", "b": [1, 2]}
+        self.assertEqual(legal_resources._content_hash(a), legal_resources._content_hash(b))
+
+        with patch('legal_resources.orjson', None):
+            self.assertEqual(legal_resources._content_hash(b), legal_resources._content_hash(a))
+
+        pid_uri = self.provider.generate_pid(a, {"type": "Test"})
+        record = self.provider._pids[pid_uri[len(PID_PREFIX):]]
+        self.assertEqual(record["content_hash"], legal_resources._content_hash(a))
+        self.assertEqual(record["hash_algorithm"], legal_resources.CONTENT_HASH_ALGORITHM)
+
+    def test_pid_journal_skips_torn_line(self):
+        pid_uri = self.provider.generate_pid({"n": 1}, {"type": "Test"})
+        with open(self.provider.pid_journal_path, 'ab') as f:
+            f.write(b'{"handle": "trunc')
+
+        new_provider = LegalResourceProvider(pid_file_path=self.test_pid_file)
+        self.assertEqual(new_provider.get_resource_by_pid(pid_uri), {"n": 1})
+        self.assertEqual(len(new_provider._pids), 1)
+
     def test_pid_chaining(self):
         # Create parent resource
         parent_content = {"id": 1, "name": "Parent Contract"}
@@ -1,6 +1,9 @@
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock
-from Logic import calculate_liquidated_damages, RedLineInterceptors, DiscretionaryWeight, RiskLevel, InvalidParamsError
+from Logic import calculate_liquidated_damages, RedLineInterceptors, DiscretionaryWeight, RiskLevel, InvalidParamsError, _calc_penalty
+from Logic import calculate_liquidated_damages_batch, _penalty_cached, clear_calculation_cache
+from errors import ErrorCode
 
 class TestLogic(unittest.TestCase):
 
@@ -65,9 +68,8 @@ class TestLogic(unittest.TestCase):
         actual_loss = 10000.0
         
         # Construct DiscretionaryWeight manually
-        # Note: If Logic.py's DiscretionaryWeight dataclass definition doesn't accept 'malignancy_multiplier',
-        # we construct it with valid args and set extra attributes dynamically.
-        # Assuming args are: performance_ratio, fault_score, expectation_interest_included, is_consumer_contract
+        # DiscretionaryWeight is a frozen slots dataclass: only its declared fields can be set
+        # Args are: performance_ratio, fault_score, expectation_interest_included, is_consumer_contract
         
         dw_low = DiscretionaryWeight(
              performance_ratio=0.9,
@@ -75,8 +77,6 @@ class TestLogic(unittest.TestCase):
              expectation_interest_included=False,
              is_consumer_contract=False
         )
-        # Manually set if not in constructor
-        dw_low.malignancy_multiplier = 1.0
         
         # Case A: Good faith
         result_a = calculate_liquidated_damages(
@@ -91,7 +91,6 @@ class TestLogic(unittest.TestCase):
              expectation_interest_included=False,
              is_consumer_contract=False
         )
-        dw_high.malignancy_multiplier = 1.5
         
         # Case B: Bad faith
         result_b = calculate_liquidated_damages(
@@ -102,5 +101,83 @@ class TestLogic(unittest.TestCase):
 
         self.assertGreater(result_b['final_suggestion'], result_a['final_suggestion'])
 
+    def test_lpr_cache(self):
+        """Test LPR is fetched once per TTL window and can be invalidated"""
+        RedLineInterceptors.clear_lpr_cache()
+        with patch('Logic._fetch_lpr', return_value=0.035) as mock_fetch:
+            self.assertEqual(RedLineInterceptors.get_latest_lpr(), 0.035)
+            self.assertEqual(RedLineInterceptors.get_latest_lpr(), 0.035)
+            self.assertEqual(mock_fetch.call_count, 1)
+
+            RedLineInterceptors.clear_lpr_cache()
+            RedLineInterceptors.get_latest_lpr()
+            self.assertEqual(mock_fetch.call_count, 2)
+        RedLineInterceptors.clear_lpr_cache()
+
+    def test_lpr_async_single_flight(self):
+        """Test concurrent async LPR lookups share one upstream fetch"""
+        RedLineInterceptors.clear_lpr_cache()
+
+        async def fetch_concurrently():
+            return await asyncio.gather(*(RedLineInterceptors.get_latest_lpr_async() for _ in range(5)))
+
+        with patch('Logic._fetch_lpr', return_value=0.035) as mock_fetch:
+            self.assertEqual(asyncio.run(fetch_concurrently()), [0.035] * 5)
+            self.assertEqual(mock_fetch.call_count, 1)
+            # 同步路径共享同一缓存
+            self.assertEqual(RedLineInterceptors.get_latest_lpr(), 0.035)
+            self.assertEqual(mock_fetch.call_count, 1)
+        RedLineInterceptors.clear_lpr_cache()
+
+    def test_calc_penalty_kernel(self):
+        """Test numeric kernel clamps negative loss and over-performance"""
+        L, w1, gamma, penalty = _calc_penalty(10000.0, 0.0, 0.0, 0.5, 1.5)
+        self.assertAlmostEqual(gamma, 0.225)
+        self.assertAlmostEqual(penalty, 12250.0)
+
+        L, w1, gamma, penalty = _calc_penalty(100.0, 0.0, 500.0, 1.5, 2.0)
+        self.assertEqual(L, 0.0)
+        self.assertEqual(w1, 0.0)
+        self.assertEqual(penalty, 0.0)
+
+    def test_penalty_memoization(self):
+        """Test repeated inputs hit the calculation cache"""
+        clear_calculation_cache()
+        dw = DiscretionaryWeight(0.5, 1.5, False, False)
+        first = calculate_liquidated_damages(actual_loss=10000.0, discretionary_weight=dw)
+        second = calculate_liquidated_damages(actual_loss=10000.0, discretionary_weight=dw)
+        self.assertEqual(first['final_suggestion'], second['final_suggestion'])
+        self.assertEqual(_penalty_cached.cache_info().hits, 1)
+        clear_calculation_cache()
+        self.assertEqual(_penalty_cached.cache_info().currsize, 0)
+
+    def test_batch_matches_scalar(self):
+        """Test vectorized batch API agrees with scalar calculation and flags red lines"""
+        batch = calculate_liquidated_damages_batch({
+            "scenario": ["general_contract", "private_lending", "private_lending", "labor_contract", "labor_contract"],
+            "actual_loss": [10000.0, 0.0, 0.0, 0.0, 0.0],
+            "performance_ratio": [0.5, 1.0, 1.0, 1.0, 1.0],
+            "fault_score": [1.5, 1.0, 1.0, 1.0, 1.0],
+            "rate": [0.0, 0.10, 0.20, 0.0, 0.0],
+            "training_cost": [0.0, 0.0, 0.0, 10000.0, 10000.0],
+            "total_months": [12, 12, 12, 60, 0],
+            "remaining_months": [0, 0, 0, 36, 10],
+        })
+
+        scalar = calculate_liquidated_damages(
+            actual_loss=10000.0,
+            discretionary_weight=DiscretionaryWeight(0.5, 1.5, False, False)
+        )
+        self.assertAlmostEqual(batch["final_suggestion"][0], scalar["final_suggestion"])
+        self.assertAlmostEqual(batch["final_suggestion"][1], 0.10)
+        self.assertAlmostEqual(batch["final_suggestion"][3], 6000.0)
+        self.assertEqual(list(batch["status"]), [
+            ErrorCode.SUCCESS.value,
+            ErrorCode.SUCCESS.value,
+            ErrorCode.INVALID_PARAMS.value,
+            ErrorCode.SUCCESS.value,
+            ErrorCode.INVALID_PARAMS.value,
+        ])
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,46 +4,8 @@ import asyncio
 from unittest.mock import MagicMock
 from privacy_middleware import PrivacyPreservingMAE
 
-# Mocking mcp modules to allow testing without installation
-import sys
-
-# Create a mock object for the mcp module and submodules
-mock_mcp = MagicMock()
-mock_mcp.server.Server = MagicMock
-mock_mcp.types.Tool = MagicMock
-mock_mcp.types.TextContent = MagicMock
-mock_mcp.types.ImageContent = MagicMock
-mock_mcp.types.EmbeddedResource = MagicMock
-mock_mcp.types.Resource = MagicMock
-mock_mcp.types.Prompt = MagicMock
-mock_mcp.types.PromptMessage = MagicMock
-mock_mcp.types.GetPromptResult = MagicMock
-mock_mcp.server.stdio.stdio_server = MagicMock
-
-# Define a mock decorator generator that returns a decorator
-def mock_decorator_generator(*args, **kwargs):
-    def decorator(func):
-        return func
-    return decorator
-
-# Configure the mock server instance to return the mock decorator generator
-mock_server_instance = MagicMock()
-mock_server_instance.list_tools = MagicMock(side_effect=mock_decorator_generator)
-mock_server_instance.call_tool = MagicMock(side_effect=mock_decorator_generator)
-mock_server_instance.list_resources = MagicMock(side_effect=mock_decorator_generator)
-mock_server_instance.read_resource = MagicMock(side_effect=mock_decorator_generator)
-mock_server_instance.list_prompts = MagicMock(side_effect=mock_decorator_generator)
-mock_server_instance.get_prompt = MagicMock(side_effect=mock_decorator_generator)
-
-# Make Server() return our configured mock instance
-mock_mcp.server.Server.return_value = mock_server_instance
-
-sys.modules['mcp'] = mock_mcp
-sys.modules['mcp.server'] = mock_mcp.server
-sys.modules['mcp.server.stdio'] = mock_mcp.server.stdio
-sys.modules['mcp.types'] = mock_mcp.types
-
-# Now we can safely import server
+# server.py falls back to mock_mcp when the mcp package is not installed,
+# so no sys.modules patching is needed (it would leak into other test modules)
 from server import LegalCNServer
 
 class TestPrivacyIntegration(unittest.TestCase):
@@ -53,9 +15,8 @@ class TestPrivacyIntegration(unittest.TestCase):
         self.MockServer = patcher.start()
         self.addCleanup(patcher.stop)
 
-        # Patch load_dotenv to avoid errors
-        with unittest.mock.patch('server.load_dotenv'):
-            self.server = LegalCNServer()
+        # load_dotenv runs once when server is imported; constructing the server does not re-read .env
+        self.server = LegalCNServer()
 
     def test_middleware_masking(self):
         middleware = PrivacyPreservingMAE()
@@ -1,5 +1,6 @@
 import unittest
-from privacy_middleware import PrivacyPreservingMAE
+import privacy_middleware
+from privacy_middleware import PrivacyPreservingMAE, get_mae
 
 class TestPrivacyMiddleware(unittest.TestCase):
     def setUp(self):
@@ -30,6 +31,113 @@ class TestPrivacyMiddleware(unittest.TestCase):
         masked = self.middleware.mask_sensitive_data(text)
         self.assertEqual(masked, "Email: a***@example.com")
         
+    def test_middleware_masking_mixed(self):
+        # All PII kinds in one string are masked in a single pass
+        text = "手机13812345678，身份证110101199001011234，账号6222021001112223333，邮箱bob@example.com"
+        masked = self.middleware.mask_sensitive_data(text)
+        self.assertEqual(masked, "手机138****5678，身份证110101********1234，账号**** 3333，邮箱b***@example.com")
+        self.assertEqual(self.middleware.mask_sensitive_data("ID: 110101900101123"), "ID: 110101******123")
+
+    def test_middleware_masking_account_boundaries(self):
+        # Account numbers must not touch other digits, so longer digit runs are not partially masked
+        text = "账号6222021001112223333，流水号62220210011122233334444"
+        masked = self.middleware.mask_sensitive_data(text)
+        self.assertEqual(masked, "账号**** 3333，流水号62220210011122233334444")
+
+    def test_middleware_masking_long_local_part(self):
+        # The email local part is capped at 64 chars, so long runs without a valid domain scan in linear time
+        text = "a" * 50000 + "@example"
+        self.assertIs(self.middleware.mask_sensitive_data(text), text)
+        # A longer local part is still masked as a whole, keeping only its first char
+        self.assertEqual(self.middleware.mask_sensitive_data("x" * 70 + "@example.com"), "x***@example.com")
+        self.assertEqual(self.middleware.mask_sensitive_data("电话13812345678 " + "y" * 70 + "@example.com"),
+                         "电话138****5678 y***@example.com")
+
+    def test_middleware_masking_prechecks(self):
+        # Text without digits or '@' is returned untouched; emails alone still get masked
+        self.assertEqual(self.middleware.mask_sensitive_data("无个人信息的合同文本"), "无个人信息的合同文本")
+        self.assertEqual(self.middleware.mask_sensitive_data("邮箱bob@example.com"), "邮箱b***@example.com")
+        self.assertEqual(self.middleware.mask_sensitive_data("电话13812345678"), "电话138****5678")
+        # Unchanged text comes back as the same object, including long texts
+        for text in ("合同第5条, 联系 a@b", "根据第585条约定违约金。" * 100):
+            self.assertIs(self.middleware.mask_sensitive_data(text), text)
+
+    def test_middleware_mask_batch(self):
+        texts = ["电话13812345678", "无个人信息", "6222021001112223333", "bob@example.com", ""]
+        expected = [self.middleware.mask_sensitive_data(t) for t in texts]
+        self.assertEqual(self.middleware.mask_batch(texts), expected)
+        # Adjacent digits across items must not merge into one account number
+        self.assertEqual(self.middleware.mask_batch(["12345678", "90123456"]), ["12345678", "90123456"])
+        self.assertEqual(self.middleware.mask_batch(["a\x0013812345678", 5]), ["a\x00138****5678", 5])
+
+    def test_middleware_mask_bulk(self):
+        texts = [
+            "电话13812345678，身份证110101199001011234",
+            "ID 110101900101123, 11010119900101123X, 12345678901234567X9",
+            "账号6222021001112223333 / 62220210011122233334444",
+            "bob@example.com 13812345678",
+            "无个人信息", "", None,
+        ]
+        expected = [self.middleware.mask_sensitive_data(t) for t in texts]
+        self.assertEqual(self.middleware.mask_bulk(texts), expected)
+
+    def test_middleware_mask_result(self):
+        # Strings and PII-shaped integers are masked; other numbers and unchanged subtrees are returned as-is
+        unchanged = {"status": "ok", "rate": 0.05, "count": 3, "total": 62220210011, "flags": [True, None]}
+        data = {
+            "context": "电话13812345678",
+            "account": 6222021001112223333,
+            "phones": [13812345678, 42],
+            "report_pid": "legal://pid/13812345678",
+            "items": ({"note": "bob@example.com"}, "无个人信息"),
+            "meta": unchanged,
+        }
+        masked = self.middleware.mask_result(data)
+        self.assertEqual(masked["context"], "电话138****5678")
+        self.assertEqual(masked["account"], "**** 3333")
+        self.assertEqual(masked["phones"], ["138****5678", 42])
+        # PID and trace-ID fields are generated by the server and never masked
+        self.assertEqual(masked["report_pid"], "legal://pid/13812345678")
+        self.assertEqual(masked["items"], [{"note": "b***@example.com"}, "无个人信息"])
+        self.assertIs(masked["meta"], unchanged)
+        self.assertEqual(data["context"], "电话13812345678")
+        self.assertIs(self.middleware.mask_result(unchanged), unchanged)
+
+    def test_middleware_mask_bulk_concurrent(self):
+        # The shared middleware is called from worker threads; concurrent kernel calls must not interfere
+        from concurrent.futures import ThreadPoolExecutor
+        texts = ["电话13812345678，账号6222021001112223333"] * 200
+        expected = [self.middleware.mask_sensitive_data(t) for t in texts]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(self.middleware.mask_bulk, [texts] * 8))
+        self.assertEqual(results, [expected] * 8)
+
+    def test_middleware_masking_long_text(self):
+        # Single texts stay on the regex path; the byte kernel behind mask_bulk must agree with it
+        clause = "电话13812345678，身份证110101199001011234，账号6222021001112223333；"
+        masked = "电话138****5678，身份证110101********1234，账号**** 3333；"
+        self.assertEqual(self.middleware.mask_sensitive_data(clause * 40), masked * 40)
+        self.assertEqual(self.middleware.mask_bulk([clause * 40]), [masked * 40])
+
+    def test_patterns_compiled_once(self):
+        # Regexes are compiled at module load and shared by every instance
+        other = PrivacyPreservingMAE()
+        self.assertIs(self.middleware.patterns, privacy_middleware._PATTERNS)
+        self.assertIs(other.patterns["phone"], self.middleware.patterns["phone"])
+        self.assertIs(other._combined_re, self.middleware._combined_re)
+
+    def test_get_mae_shared_instance(self):
+        mae = get_mae()
+        self.assertIsInstance(mae, PrivacyPreservingMAE)
+        self.assertIs(get_mae(), mae)
+
+    def test_elicitation_check_fresh_instance(self):
+        # A newly constructed middleware must have its elicitation fields set up alongside the masking regexes
+        middleware = PrivacyPreservingMAE()
+        self.assertIn("medical_record", middleware.sensitive_fields)
+        self.assertIn("'病历'", middleware.check_elicitation_requirement({"note": "附病历一份"}))
+        self.assertIsNone(middleware.check_elicitation_requirement({"contract_text": "13812345678"}))
+
     def test_elicitation_check(self):
         # Safe args
         args = {"contract_text": "Normal contract"}
@@ -41,6 +149,11 @@ class TestPrivacyMiddleware(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertIn("medical_record", result)
 
+        # Several hits report the first field in list order, not text order
+        args = {"note": "指纹 and Medical_Record attached"}
+        result = self.middleware.check_elicitation_requirement(args)
+        self.assertIn("'medical_record'", result)
+
     def test_metadata_injection(self):
         data = {"result": "ok"}
         processed = self.middleware.inject_compliance_metadata(data)
@@ -1,60 +1,61 @@
 import unittest
-import asyncio
 import json
-from unittest.mock import MagicMock, patch
+import logging
+from collections import Counter
+from unittest.mock import patch
+import server as server_module
 from server import LegalCNServer
 from errors import ErrorCode
 # from mcp.types import TextContent # Use mock types from server import if mcp not available
 
-class TestRefactorVerification(unittest.TestCase):
+class _NoopPrivacy:
+    """隐私中间件的测试替身：不触发 Elicitation，结果原样返回，并记录各方法的调用次数"""
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def check_elicitation_requirement(self, arguments):
+        self.calls["check_elicitation_requirement"] += 1
+        return None
+
+    def mask_sensitive_data(self, text):
+        self.calls["mask_sensitive_data"] += 1
+        return text
+
+    def mask_result(self, data):
+        self.calls["mask_result"] += 1
+        return data
+
+    def inject_compliance_metadata(self, result):
+        self.calls["inject_compliance_metadata"] += 1
+        return result
+
+
+class _RecordCollector(logging.Handler):
+    """把日志记录保存在内存列表中，供断言检查"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestRefactorVerification(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         # Patch Server before instantiating LegalCNServer
         patcher = patch('server.Server')
         self.MockServer = patcher.start()
         self.addCleanup(patcher.stop)
         
-        # Patch load_dotenv to avoid errors
-        patcher_env = patch('server.load_dotenv')
-        patcher_env.start()
-        self.addCleanup(patcher_env.stop)
-        
         self.server = LegalCNServer()
-        # Mock privacy middleware to avoid side effects
-        # IMPORTANT: We must mock the instance attached to the server, not the class or a new instance,
-        # unless we are sure where it comes from.
-        # server.py: self.privacy_middleware = PrivacyPreservingMAE()
-        # So mocking self.server.privacy_middleware is correct.
-        
-        # However, the failure suggests: [Elicitation Required] <MagicMock id='4385939216'>
-        # This implies check_elicitation_requirement returned a MagicMock instead of None.
-        # Ah! default MagicMock return value is a new MagicMock.
-        # But we set return_value=None.
-        # Maybe the server re-initializes it or something?
-        # Or maybe I am mocking it AFTER it's used? No, setUp happens before test.
-        
-        # Wait, in _handle_call_tool (server.py):
-        # elicitation = self.privacy_middleware.check_elicitation_requirement(arguments)
-        # if elicitation: raise ElicitationRequiredError(...)
-        
-        # If mock returns None, if elicitation: is False.
-        # Why did it fail?
-        # Maybe I mocked it incorrectly in previous attempts or imports are messing up.
-        
-        # Let's be very explicit.
-        self.server.privacy_middleware = MagicMock()
-        self.server.privacy_middleware.check_elicitation_requirement.return_value = None
-        self.server.privacy_middleware.inject_compliance_metadata.side_effect = lambda x: x
-        self.server.privacy_middleware.mask_sensitive_data.side_effect = lambda x: x
+        # 用轻量的测试替身替换隐私中间件，避免脱敏与元数据注入影响断言
+        self.server.privacy_middleware = _NoopPrivacy()
 
-    def test_health_check_structure(self):
+    async def test_health_check_structure(self):
         """验证 /health 探针返回结构是否包含成熟度和一致性校验"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            self.server._handle_call_tool("health_check", {})
-        )
-        loop.close()
+        result = await self.server._handle_call_tool("health_check", {})
         
         content = json.loads(result[0].text)
         
@@ -63,22 +64,138 @@ class TestRefactorVerification(unittest.TestCase):
         self.assertIn("transcription_maturity", content["checks"])
         self.assertIn("legal_db_consistency", content["checks"])
         self.assertEqual(content["checks"]["transcription_maturity"]["status"], "ok")
+        self.assertRegex(content["timestamp"], r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$")
+
+    def test_health_check_subresults_cached(self):
+        """验证 TTL 内的多次 health_check 共用一次子检查"""
+        with patch.object(self.server, '_check_legal_db_consistency',
+                          wraps=self.server._check_legal_db_consistency) as consistency:
+            first = self.server._health_check_data()
+            second = self.server._health_check_data()
+        self.assertEqual(consistency.call_count, 1)
+        self.assertEqual(first["checks"], second["checks"])
+
+        # 缓存过期后重新检查
+        with patch('server._HEALTH_CHECK_TTL', 0.0), \
+                patch.object(self.server, '_check_legal_db_consistency',
+                             wraps=self.server._check_legal_db_consistency) as consistency:
+            self.server._health_check_data()
+        self.assertEqual(consistency.call_count, 1)
+
+    def test_list_caches_built_at_construction(self):
+        """验证工具、资源与提示词列表在构造时生成一次"""
+        tool_names = [tool.name for tool in self.server._tools_cache]
+        self.assertIn("health_check", tool_names)
+        self.assertEqual(len(tool_names), len(set(tool_names)))
+
+        expected_uris = [meta["uri"] for meta in self.server.legal_resource_provider.list_resources()]
+        self.assertEqual([res.uri for res in self.server._resources_cache], expected_uris)
+        self.assertEqual([p.name for p in self.server._prompts_cache],
+                         ["contract_review_flow", "risk_assessment_template"])
+
+        # 注册新资源后，资源列表缓存会重建
+        self.assertIs(self.server._current_resources(), self.server._resources_cache)
+        self.server.legal_resource_provider.register_resource(
+            "legal://templates/nda", "保密协议模板", "NDA template", {"clauses": []})
+        self.assertIn("legal://templates/nda", [res.uri for res in self.server._current_resources()])
+
+    async def test_tool_dispatch_table(self):
+        """验证分派表覆盖全部已声明的工具与提示词，未知工具映射为 -32602"""
+        self.assertEqual(set(self.server._tool_handlers), {tool.name for tool in self.server._tools_cache})
+        self.assertEqual(set(self.server._prompt_handlers), {prompt.name for prompt in self.server._prompts_cache})
+
+        result = await self.server._handle_call_tool("no_such_tool", {})
+        self.assertEqual(json.loads(result[0].text)["code"], -32602)
+
+    async def test_tool_result_serialized_once_with_metadata(self):
+        """验证工具结果注入合规元数据后直接序列化，且不会修改共享的常量字典"""
+        from privacy_middleware import PrivacyPreservingMAE
+        self.server.privacy_middleware = PrivacyPreservingMAE()
+
+        result = await self.server._handle_call_tool("get_legal_suggestion", {"risk_type": "penalty"})
 
-    def test_invalid_params_mapping_private_lending(self):
+        content = json.loads(result[0].text)
+        self.assertIn("gb_45438_compliance", content["metadata"])
+        shared = self.server.logic.get_legal_suggestion("penalty", "")
+        self.assertNotIn("metadata", shared)
+
+    async def test_batch_execute_aggregates_results(self):
+        """验证 batch_execute 按操作顺序汇总结果，单个操作失败不影响其余操作"""
+        arguments = {
+            "operations": [
+                {"name": "get_legal_suggestion", "arguments": {"risk_type": "penalty"}},
+                {"name": "calculate_damages", "arguments": {"scenario": "private_lending", "rate": 0.20}},
+                {"name": "unknown_tool"},
+                {"name": "health_check"},
+            ],
+            "maxConcurrent": 2
+        }
+        result = await self.server._handle_call_tool("batch_execute", arguments)
+
+        content = json.loads(result[0].text)
+        self.assertEqual([r["status"] for r in content["results"]], ["ok", "error", "error", "ok"])
+        self.assertEqual(content["results"][1]["error"]["code"], -32602)
+        self.assertEqual(content["results"][3]["result"]["checks"]["transcription_maturity"]["status"], "ok")
+        self.assertEqual(content["summary"], {"total": 4, "succeeded": 2, "failed": 2, "cancelled": 0})
+        # 合规元数据注入与脱敏只对汇总结果执行一次
+        self.assertEqual(self.server.privacy_middleware.calls["inject_compliance_metadata"], 1)
+        self.assertEqual(self.server.privacy_middleware.calls["mask_result"], 1)
+
+    async def test_batch_execute_stop_on_error(self):
+        """验证 stopOnError 时首个失败会取消其余未完成的操作"""
+        arguments = {
+            "operations": [{"name": "batch_execute"}] + [{"name": "health_check"}] * 3,
+            "maxConcurrent": 1,
+            "stopOnError": True
+        }
+        result = await self.server._handle_call_tool("batch_execute", arguments)
+
+        content = json.loads(result[0].text)
+        self.assertEqual([r["status"] for r in content["results"]], ["error", "cancelled", "cancelled", "cancelled"])
+        self.assertEqual(content["summary"]["cancelled"], 3)
+
+    async def test_tool_result_masked_before_serialization(self):
+        """验证工具结果中的个人信息在序列化前被脱敏"""
+        from privacy_middleware import PrivacyPreservingMAE
+        self.server.privacy_middleware = PrivacyPreservingMAE()
+
+        result = await self.server._handle_call_tool("get_legal_suggestion", {"risk_type": "penalty", "context": "联系人电话13812345678"})
+
+        content = json.loads(result[0].text)
+        self.assertEqual(content["context"], "联系人电话138****5678")
+        self.assertNotIn("13812345678", result[0].text)
+
+    async def test_damages_batch_rejects_malformed_cases(self):
+        """验证 calculate_damages_batch 对非法 cases 返回 -32602，而非内部错误"""
+        for arguments in (
+            {},
+            {"cases": {"actual_loss": 100}},
+            {"cases": [{"actual_loss": 100}, "not a case"]},
+            {"cases": [{"actual_loss": "100"}]},
+            {"cases": [{"performance_ratio": True}]},
+            {"cases": [{"scenario": "labor_contract", "total_months": 12.5}]},
+            {"cases": [{"scenario": 1}]},
+        ):
+            result = await self.server._handle_call_tool("calculate_damages_batch", arguments)
+            content = json.loads(result[0].text)
+            self.assertEqual(content["code"], -32602, arguments)
+
+        result = await self.server._handle_call_tool("calculate_damages_batch", {"cases": [
+            {"actual_loss": 1000, "performance_ratio": 0.5},
+            {"scenario": "labor_contract", "training_cost": 1200, "total_months": 12, "remaining_months": 6},
+        ]})
+        content = json.loads(result[0].text)
+        self.assertEqual([r["final_suggestion"] for r in content["results"]], [1150.0, 600.0])
+
+    async def test_invalid_params_mapping_private_lending(self):
         """验证参数超出法律红线时映射为 -32602 (Invalid params)"""
         arguments = {
             "scenario": "private_lending",
             "rate": 0.20 # 20% > 3.45% * 4 = 13.8%
         }
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         # Expecting InvalidParamsError which is caught in _handle_call_tool and returned as JSON
-        result = loop.run_until_complete(
-            self.server._handle_call_tool("calculate_damages", arguments)
-        )
-        loop.close()
+        result = await self.server._handle_call_tool("calculate_damages", arguments)
         
         content = json.loads(result[0].text)
         
@@ -87,7 +204,7 @@ class TestRefactorVerification(unittest.TestCase):
         self.assertEqual(content["details"]["risk_level"], "Critical")
         self.assertIn("legal_basis", content["details"])
 
-    def test_db_sync_failure_mapping(self):
+    async def test_db_sync_failure_mapping(self):
         """验证法律数据库同步失败时映射为 -32001 (Internal error)"""
         arguments = {
             "scenario": "private_lending",
@@ -95,47 +212,33 @@ class TestRefactorVerification(unittest.TestCase):
             "simulate_db_failure": True
         }
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         # Expecting InternalError
-        result = loop.run_until_complete(
-            self.server._handle_call_tool("calculate_damages", arguments)
-        )
-        loop.close()
+        result = await self.server._handle_call_tool("calculate_damages", arguments)
         
         content = json.loads(result[0].text)
         
         self.assertEqual(content["code"], -32001) # ErrorCode.INTERNAL_ERROR.value
         self.assertIn("数据库同步失败", content["message"])
 
-    def test_causal_trace_id_injection(self):
+    async def test_causal_trace_id_injection(self):
         """验证 causal_trace_id 被正确注入并记录"""
         arguments = {
             "scenario": "general_contract",
             "actual_loss": 1000
         }
         
-        with patch('server.logger') as mock_logger:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            loop.run_until_complete(
-                self.server._handle_call_tool("calculate_damages", arguments)
-            )
-            loop.close()
-            
-            # Check if logger was called with trace_id
-            # 找到包含 "Tool called: calculate_damages" 的调用
-            found_call = False
-            for call in mock_logger.info.call_args_list:
-                args, kwargs = call
-                if "Tool called: calculate_damages" in args[0]:
-                    if "extra" in kwargs and "trace_id" in kwargs["extra"]:
-                        found_call = True
-                        break
-            
-            self.assertTrue(found_call, "trace_id should be logged when tool is called")
+        # 在真实的 logger 上挂一个收集日志记录的 handler，经由实际的日志路径验证 extra 字段
+        collector = _RecordCollector()
+        server_module.logger.addHandler(collector)
+        self.addCleanup(server_module.logger.removeHandler, collector)
+
+        await self.server._handle_call_tool("calculate_damages", arguments)
+
+        found_call = any(
+            record.getMessage() == "Tool called: calculate_damages" and getattr(record, "trace_id", None)
+            for record in collector.records
+        )
+        self.assertTrue(found_call, "trace_id should be logged when tool is called")
 
 if __name__ == '__main__':
     unittest.main()
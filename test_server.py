@@ -10,7 +10,7 @@ import pytest
 from server import LegalCNServer
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="module")
 async def test_tools():
     """测试 Tools 功能"""
     print("=" * 60)
@@ -66,7 +66,7 @@ async def test_tools():
     print(result[0].text)
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="module")
 async def test_resources():
     """测试 Resources 功能"""
     print("\n\n" + "=" * 60)
@@ -99,7 +99,7 @@ async def test_resources():
     print(json.dumps(rules, ensure_ascii=False, indent=2))
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="module")
 async def test_prompts():
     """测试 Prompts 功能"""
     print("\n\n" + "=" * 60)
@@ -127,7 +127,7 @@ async def test_prompts():
     print(result.messages[0].content.text[:400] + "...")
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="module")
 async def test_config():
     """测试配置"""
     print("\n\n" + "=" * 60)
@@ -170,4 +170,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop 为可选依赖，未安装时 (含 Windows) 使用 asyncio 默认事件循环
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
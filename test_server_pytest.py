@@ -9,11 +9,15 @@ import json
 import asyncio
 from server import LegalCNServer
 
-@pytest.mark.asyncio
-async def test_tools():
+
+@pytest.fixture(scope="module")
+def server():
+    """模块内各测试共用一个服务实例 (测试只读取服务状态，不做修改)"""
+    return LegalCNServer()
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_tools(server):
     """测试 Tools 功能"""
-    server = LegalCNServer()
-    
     # 测试合同风险检查
     test_contract = """
     甲乙双方就本次合作达成如下协议:
@@ -54,11 +58,9 @@ async def test_tools():
     assert result is not None
     assert len(result) > 0
 
-@pytest.mark.asyncio
-async def test_resources():
+@pytest.mark.asyncio(loop_scope="module")
+async def test_resources(server):
     """测试 Resources 功能"""
-    server = LegalCNServer()
-    
     # 测试民法典资源
     content = server.logic.get_civil_code_contract()
     assert content is not None
@@ -74,11 +76,9 @@ async def test_resources():
     rules = json.loads(content)
     assert rules is not None
 
-@pytest.mark.asyncio
-async def test_prompts():
+@pytest.mark.asyncio(loop_scope="module")
+async def test_prompts(server):
     """测试 Prompts 功能"""
-    server = LegalCNServer()
-    
     # 测试合同审查流程
     result = server._get_contract_review_prompt({"contract_type": "买卖合同"})
     assert result.description is not None
@@ -89,7 +89,7 @@ async def test_prompts():
     assert result.description is not None
     assert len(result.messages) > 0
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="module")
 async def test_config():
     """测试配置"""
     from config import Config